@@ -0,0 +1,157 @@
+import math
+
+import numpy as np
+
+
+# https://www.mathway.com/ru/Graph
+# функция активации нейронов: скалярная, векторная для целого слоя и табличная с линейной интерполяцией
+class Activation:
+    name: str
+    # имя -> функция активации, для записи в файл мозга
+    registry: dict[str, "Activation"] = {}
+
+    # границы таблицы, за которыми функция заменяется значениями на краях (или точными значениями)
+    lookup_borders: tuple[float, float] | None = None
+    # допустимая ошибка табличного вычисления
+    max_lookup_error = 1e-6
+    max_lookup_size = 2**20
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        Activation.registry[cls.name] = cls()
+
+    def __init__(self) -> None:
+        self.lookup_x: np.ndarray | None = None
+        self.lookup_y: np.ndarray | None = None
+        self.lookup_error: float | None = None
+        # границы и выражение функции, по которым построена таблица
+        self.lookup_key: tuple | None = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name})"
+
+    @classmethod
+    def get(cls, name: str) -> "Activation":
+        return cls.registry[name]
+
+    def scalar(self, value: float) -> float:
+        raise NotImplementedError()
+
+    def vector(self, values: np.ndarray) -> np.ndarray:
+        raise NotImplementedError()
+
+    # выражение для сгенерированного кода мозга, None - функцию нельзя встроить
+    def get_expression(self, value: str) -> str | None:
+        return None
+
+    # границы могут зависеть от параметров функции
+    def get_lookup_borders(self) -> tuple[float, float] | None:
+        return self.lookup_borders
+
+    # выражение учитывает параметры функции, поэтому при их изменении таблица строится заново
+    def get_lookup_key(self) -> tuple:
+        return self.get_lookup_borders(), self.get_expression("x")
+
+    def prepare_lookup(self) -> None:
+        borders = self.get_lookup_borders()
+        # таблица удваивается, пока ошибка в серединах отрезков не станет допустимой
+        size = 256
+        while True:
+            lookup_x = np.linspace(*borders, size)
+            lookup_y = self.vector(lookup_x)
+            check_x = np.linspace(*borders, size * 4)
+            error = float(np.abs(np.interp(check_x, lookup_x, lookup_y) - self.vector(check_x)).max())
+            if error <= self.max_lookup_error or size >= self.max_lookup_size:
+                break
+            size *= 2
+        self.lookup_x = lookup_x
+        self.lookup_y = lookup_y
+        self.lookup_error = error
+        self.lookup_key = self.get_lookup_key()
+
+    def lookup(self, values: np.ndarray) -> np.ndarray:
+        if self.get_lookup_borders() is None:
+            return self.vector(values)
+        if self.lookup_key != self.get_lookup_key():
+            self.prepare_lookup()
+        return np.interp(values, self.lookup_x, self.lookup_y)
+
+
+# https://ru.wikipedia.org/wiki/%D0%A1%D0%B8%D0%B3%D0%BC%D0%BE%D0%B8%D0%B4%D0%B0
+class Sigmoid(Activation):
+    name = "sigmoid"
+    # чем больше steepness, тем круче подъем
+    steepness = 8
+
+    # за границами отличие от 0 и 1 меньше 1e-13 при любой крутизне
+    def get_lookup_borders(self) -> tuple[float, float]:
+        border = 32 / self.steepness
+        return -border, border
+
+    def scalar(self, value: float) -> float:
+        return 1 / (1 + math.e**(-self.steepness * value))
+
+    def vector(self, values: np.ndarray) -> np.ndarray:
+        return 1 / (1 + np.exp(-self.steepness * values))
+
+    def get_expression(self, value: str) -> str:
+        return f"1 / (1 + e ** (-{self.steepness!r} * {value}))"
+
+
+# https://pytorch.org/docs/stable/generated/torch.nn.ELU.html
+# отрицательная часть сдвинута на 1 вверх
+class Elu(Activation):
+    name = "elu"
+    alpha = 1
+    lookup_borders = (-32, 0)
+
+    def scalar(self, value: float) -> float:
+        if value > 0:
+            result = value
+        else:
+            result = self.alpha * (math.exp(value) - 1) + 1
+        return result
+
+    def vector(self, values: np.ndarray) -> np.ndarray:
+        return np.where(values > 0, values, self.alpha * (np.exp(np.minimum(values, 0)) - 1) + 1)
+
+    def get_expression(self, value: str) -> str:
+        return f"{value} if {value} > 0 else {self.alpha!r} * (exp({value}) - 1) + 1"
+
+    # положительная часть считается точно
+    def lookup(self, values: np.ndarray) -> np.ndarray:
+        if self.lookup_key != self.get_lookup_key():
+            self.prepare_lookup()
+        return np.where(values > 0, values, np.interp(values, self.lookup_x, self.lookup_y))
+
+
+class Tanh(Activation):
+    name = "tanh"
+    lookup_borders = (-10, 10)
+
+    def scalar(self, value: float) -> float:
+        return math.tanh(value)
+
+    def vector(self, values: np.ndarray) -> np.ndarray:
+        return np.tanh(values)
+
+    def get_expression(self, value: str) -> str:
+        return f"tanh({value})"
+
+
+# табличное вычисление не нужно - функция и так дешевая
+class Relu(Activation):
+    name = "relu"
+
+    def scalar(self, value: float) -> float:
+        if value > 0:
+            result = value
+        else:
+            result = 0.0
+        return result
+
+    def vector(self, values: np.ndarray) -> np.ndarray:
+        return np.maximum(values, 0.0)
+
+    def get_expression(self, value: str) -> str:
+        return f"{value} if {value} > 0 else 0.0"
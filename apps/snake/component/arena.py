@@ -8,6 +8,10 @@ class Arena:
         self.world_map.place_food()
 
     def perform(self) -> None:
-        self.snake.perform()
+        self.snake.choose_direction()
+        self.advance()
+
+    def advance(self) -> None:
+        self.snake.advance()
         if self.snake.starvation == 0:
             self.world_map.place_food()
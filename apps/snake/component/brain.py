@@ -1,18 +1,54 @@
+import copy
+import hashlib
 import inspect
 import json
 import math
+import mmap
 import random
+import struct
 import sys
+from array import array
+from collections import OrderedDict
 from typing import Callable, Self
 
+import numpy as np
+
+from apps.snake.component.activation import Activation, Sigmoid
+
 
 NeuronDescription = dict[str, list[float] | str | float]
 LayerDescription = list[NeuronDescription]
 BrainDescription = dict[str, list[LayerDescription] | str | int]
 
 
-# https://www.mathway.com/ru/Graph
+# кольцевой буфер выходов нейрона, нулевой элемент - последний выход
+class OutputHistory:
+    __slots__ = ("values", "length", "position")
+
+    def __init__(self, length: int, values: "OutputHistory | list[float]" = ()) -> None:
+        self.length = length
+        self.values = array("d", bytes(8 * self.length))
+        self.position = 0
+        for value in reversed([values[index] for index in range(min(len(values), self.length))]):
+            self.push(value)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> float:
+        return self.values[(self.position + index) % self.length]
+
+    def push(self, value: float) -> None:
+        self.position = (self.position - 1) % self.length
+        self.values[self.position] = value
+
+    def get_recent(self, amount: int) -> list[float]:
+        return [self.values[(self.position + index) % self.length] for index in range(amount)]
+
+
 class FunctionsMixin:
+    __slots__ = ()
+
     max_mutation_spread: float
     weight_borders: list[int]
     output_borders: list[int]
@@ -23,46 +59,44 @@ class FunctionsMixin:
     def adder(self, inputs: list[float]) -> float:
         return sum(inputs[x] * self.input_weights[x] for x in range(self.inputs_amount))
 
-    # https://ru.wikipedia.org/wiki/%D0%A1%D0%B8%D0%B3%D0%BC%D0%BE%D0%B8%D0%B4%D0%B0
-    def sigmoid(self, inputs: list[float]) -> float:
-        input_value = self.adder(inputs)
-        # чем больше t, тем круче подъем
-        t = 8
-        return 1 / (1 + math.e**(-t * input_value))
-
-    # https://pytorch.org/docs/stable/generated/torch.nn.ELU.html
-    def elu(self, inputs: list[float]) -> float:
-        input_value = self.adder(inputs)
-        if input_value > 0:
-            value = input_value
-        else:
-            alpha = 1
-            value = alpha * (math.exp(input_value) - 1) + 1
-        return value
-
 
 class Neuron(FunctionsMixin):
+    __slots__ = ("input_weights", "inputs_amount", "output_history", "activation")
+
     max_mutation_spread = 0.1
     weight_borders = [-1, 1]
     output_borders = [0, 1]
-    function: Callable[[list[float]], float]
-    output_history_length = 100
+    # функция активации по умолчанию, в файле мозга она может быть задана для слоя
+    default_activation: str
+    # хранится только история, нужная для вычислений, выход для отображения - ее первый элемент
+    min_output_history_length = 1
+
+    # имя класса -> класс, для загрузки мозгов из файлов
+    classes: dict[str, type["Neuron"]] = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        Neuron.classes[cls.__name__] = cls
 
     def __init__(self, input_weights: list[float], *args, **kwargs) -> None:
-        self.input_weights = input_weights
+        self.input_weights = array("d", input_weights)
         self.inputs_amount = len(self.input_weights)
-        self.output_history: list[float] = [0 for _ in range(self.output_history_length)]
+        self.output_history = OutputHistory(self.get_min_history_length())
+        self.activation = Activation.get(self.default_activation)
 
     def __hash__(self) -> int:
         return hash(sum(hash(x) for x in self.input_weights))
 
+    def get_min_history_length(self) -> int:
+        return self.min_output_history_length
+
     def process(self, inputs: list[float]) -> None:
-        output = self.function(inputs)
-        self.output_history = [output, *self.output_history[:self.output_history_length - 1]]
+        self.output_history.push(self.activation.scalar(self.adder(inputs)))
 
     def dump(self) -> dict:
-        data = {key: value for key, value in self.__dict__.items()
-                if key in inspect.signature(self.__class__).parameters}
+        data = {key: getattr(self, key) for key in inspect.signature(self.__class__).parameters
+                if hasattr(self, key)}
+        data["input_weights"] = self.input_weights.tolist()
         data["max_mutation_spread"] = self.max_mutation_spread
         data["weight_borders"] = self.weight_borders
         data["output_borders"] = self.output_borders
@@ -80,8 +114,16 @@ class Neuron(FunctionsMixin):
         new_weight = min(new_weight, cls.weight_borders[1])
         return new_weight
 
+    # веса не меняются после создания нейрона, поэтому копия использует их же
+    def copy(self) -> Self:
+        neuron = copy.copy(self)
+        neuron.output_history = OutputHistory(len(self.output_history))
+        return neuron
+
     def mutate(self) -> Self:
-        return self.__class__([self.mutate_input_weight(weight) for weight in self.input_weights])
+        neuron = self.__class__([self.mutate_input_weight(weight) for weight in self.input_weights])
+        neuron.activation = self.activation
+        return neuron
 
     @classmethod
     def get_default_description(cls, inputs_amount: int, *args, **kwargs) -> NeuronDescription:
@@ -97,26 +139,37 @@ class Neuron(FunctionsMixin):
 
 
 class FeedbackNeuron(Neuron):
+    __slots__ = ()
+
     history_depth = 1
 
+    def get_min_history_length(self) -> int:
+        return max(super().get_min_history_length(), self.history_depth)
+
     @classmethod
     def get_default_description(cls, inputs_amount: int, *args, **kwargs) -> NeuronDescription:
         return super().get_default_description(inputs_amount + cls.history_depth, *args, **kwargs)
 
     def process(self, inputs: list[float]) -> None:
-        super().process([*inputs, *self.output_history[:self.history_depth]])
+        super().process([*inputs, *self.output_history.get_recent(self.history_depth)])
 
 
 class InputNeuron(Neuron):
-    function = FunctionsMixin.sigmoid
+    __slots__ = ()
+
+    default_activation = Sigmoid.name
 
 
 class InnerNeuron(Neuron):
-    function = FunctionsMixin.sigmoid
+    __slots__ = ()
+
+    default_activation = Sigmoid.name
 
 
 class OutputNeuron(Neuron):
-    function = FunctionsMixin.sigmoid
+    __slots__ = ("value",)
+
+    default_activation = Sigmoid.name
 
     def __init__(self, input_weights: list[float], value: int, *args, **kwargs) -> None:
         super().__init__(input_weights, *args, **kwargs)
@@ -129,7 +182,9 @@ class OutputNeuron(Neuron):
         return self.output > other.output
 
     def mutate(self) -> Self:
-        return self.__class__([self.mutate_input_weight(weight) for weight in self.input_weights], self.value)
+        neuron = self.__class__([self.mutate_input_weight(weight) for weight in self.input_weights], self.value)
+        neuron.activation = self.activation
+        return neuron
 
     # noinspection PyMethodOverriding
     @classmethod
@@ -139,9 +194,171 @@ class OutputNeuron(Neuron):
         return description
 
 
+# веса слоя, собранные в одну матрицу, для векторизованного прохода по мозгу
+class LayerMatrix:
+    def __init__(self, layer: list[Neuron], input_layer: bool, lookup: bool = False) -> None:
+        self.activation = layer[0].activation
+        # табличное вычисление быстрее, но дает ошибку не больше Activation.max_lookup_error
+        if lookup:
+            self.function = self.activation.lookup
+        else:
+            self.function = self.activation.vector
+        # входной слой не смешивает входы - каждый нейрон получает только свой
+        self.input_layer = input_layer
+        self.neurons_amount = len(layer)
+        self.history_depth = max(neuron.history_depth if isinstance(neuron, FeedbackNeuron) else 0
+                                 for neuron in layer)
+
+        inputs_amount = layer[0].inputs_amount
+        if isinstance(layer[0], FeedbackNeuron):
+            inputs_amount -= layer[0].history_depth
+        weights = np.zeros((self.neurons_amount, inputs_amount))
+        feedback = np.zeros((self.neurons_amount, self.history_depth))
+        for index, neuron in enumerate(layer):
+            if isinstance(neuron, FeedbackNeuron):
+                weights[index] = neuron.input_weights[:-neuron.history_depth]
+                feedback[index, :neuron.history_depth] = neuron.input_weights[-neuron.history_depth:]
+            else:
+                weights[index] = neuron.input_weights
+        if self.input_layer:
+            weights = weights[:, 0]
+        self.weights = weights
+        if self.history_depth > 0:
+            self.feedback = feedback
+        else:
+            self.feedback = None
+
+    def process(self, inputs: np.ndarray, history: np.ndarray) -> np.ndarray:
+        if self.input_layer:
+            values = self.weights * inputs[:self.neurons_amount]
+        else:
+            values = self.weights @ inputs
+        if self.feedback is not None:
+            values += (self.feedback * history[:self.history_depth].T).sum(axis = 1)
+        outputs = self.function(values)
+        if len(history) > 1:
+            history[1:] = history[:-1]
+        history[0] = outputs
+        return outputs
+
+
+# превращает мозг в сгенерированную функцию без объектов нейронов, где веса - локальные переменные
+class BrainCompiler:
+    known_classes: set[type] = {InputNeuron, InnerNeuron, OutputNeuron}
+    max_cached_functions = 1024
+    # топология -> фабрика функций, принимающая веса
+    factories: dict[tuple, Callable[[tuple[float, ...]], Callable]] = {}
+    # (дайджест мозга, топология) -> функция с подставленными весами
+    # дайджест не учитывает параметры функций активации (например, Sigmoid.steepness), а топология - учитывает
+    functions: OrderedDict[tuple[str, tuple], Callable[[list[float]], tuple[int, tuple[float, ...]]]] = OrderedDict()
+
+    @classmethod
+    def can_compile(cls, brain: "Brain") -> bool:
+        return all(neuron.__class__ in cls.known_classes and neuron.activation.get_expression("x") is not None
+                   for layer in brain.layers for neuron in layer)
+
+    @staticmethod
+    def get_topology(brain: "Brain") -> tuple:
+        # выражение, а не имя функции активации, чтобы учитывались и ее параметры
+        return tuple(tuple((neuron.__class__, neuron.inputs_amount, neuron.activation.get_expression("x"))
+                           for neuron in layer) for layer in brain.layers)
+
+    @classmethod
+    def generate_source(cls, brain: "Brain") -> str:
+        weights_amount = sum(neuron.inputs_amount for layer in brain.layers for neuron in layer)
+        weights = [f"w{index}" for index in range(weights_amount)]
+        lines = [
+            "def make_process(weights, output_values):",
+            f"    {', '.join(weights)}, = weights",
+            f"    {', '.join(f'v{index}' for index in range(len(brain.layers[-1])))}, = output_values",
+            "    e = math.e",
+            "    exp = math.exp",
+            "    tanh = math.tanh",
+            "",
+            "    def process(inputs):"
+        ]
+
+        weight_index = 0
+        previous_outputs: list[str] = []
+        all_outputs: list[str] = []
+        for layer_index, layer in enumerate(brain.layers):
+            outputs = []
+            for neuron_index, neuron in enumerate(layer):
+                if layer_index == 0:
+                    layer_inputs = [f"inputs[{neuron_index}]"]
+                else:
+                    layer_inputs = previous_outputs
+                value = " + ".join(f"{weights[weight_index + index]} * {layer_input}"
+                                   for index, layer_input in enumerate(layer_inputs))
+                weight_index += neuron.inputs_amount
+                output = f"n{layer_index}_{neuron_index}"
+                expression = neuron.activation.get_expression(output)
+                lines.append(f"        {output} = {value}")
+                lines.append(f"        {output} = {expression}")
+                outputs.append(output)
+            all_outputs.extend(outputs)
+            previous_outputs = outputs
+
+        # первый из максимальных выходов, как у max() по OutputNeuron
+        lines.append(f"        best = {previous_outputs[0]}")
+        lines.append("        output = v0")
+        for index, output in enumerate(previous_outputs[1:], 1):
+            lines.append(f"        if {output} > best:")
+            lines.append(f"            best = {output}")
+            lines.append(f"            output = v{index}")
+        lines.append(f"        return output, ({', '.join(all_outputs)},)")
+        lines.append("")
+        lines.append("    return process")
+        return "\n".join(lines)
+
+    @classmethod
+    def compile(cls, brain: "Brain") -> Callable[[list[float]], tuple[int, tuple[float, ...]]] | None:
+        if not cls.can_compile(brain):
+            return None
+
+        topology = cls.get_topology(brain)
+        key = (brain.digest, topology)
+        if key in cls.functions:
+            cls.functions.move_to_end(key)
+        else:
+            if topology not in cls.factories:
+                namespace = {"math": math}
+                name = str([len(x) for x in brain.layers])
+                exec(compile(cls.generate_source(brain), f"<brain {name}>", "exec"), namespace)
+                cls.factories[topology] = namespace["make_process"]
+
+            weights = tuple(weight for layer in brain.layers for neuron in layer for weight in neuron.input_weights)
+            output_values = tuple(neuron.value for neuron in brain.layers[-1])
+            cls.functions[key] = cls.factories[topology](weights, output_values)
+            if len(cls.functions) > cls.max_cached_functions:
+                cls.functions.popitem(last = False)
+        return cls.functions[key]
+
+
+# двоичный формат файла мозга (little-endian):
+# заголовок, метаданные в json, имена классов нейронов, описания слоев и выровненный блок весов
+class BrainFormat:
+    magic = b"SNKB"
+    version = 1
+    alignment = 8
+    # магия, версия, размер веса, резерв, поколение, счет, длина метаданных, длина имен классов
+    header = struct.Struct("<4sHBBIdII")
+    counter = struct.Struct("<I")
+    # индекс класса, количество входов, значение выходного нейрона
+    neuron = struct.Struct("<HIi")
+    weight_types = {
+        4: "f",
+        8: "d"
+    }
+
+
 class Brain:
     file_extension = "brain"
     default_score = 0.0
+    # вычислять функции активации слоев по таблицам
+    lookup_activations = False
+    # использовать сгенерированные функции, если топология мозга это позволяет
+    compile_inference = True
 
     def __init__(self, generation: int, score: float = default_score, name: str | None = None) -> None:
         self.layers: list[list[Neuron | OutputNeuron]] = []
@@ -151,6 +368,17 @@ class Brain:
         self.age = 0
         self._name = name
         self.loading_dict: BrainDescription | None = None
+        # None - матрицы еще не собраны, [] - мозг нельзя векторизовать и он обрабатывается по нейронам
+        self.matrices: list[LayerMatrix] | None = None
+        self.history: list[np.ndarray] = []
+        self.output_values: list[int] = []
+        # None - компиляция еще не выполнялась, False - мозг нельзя скомпилировать
+        self.compiled: Callable[[list[float]], tuple[int, tuple[float, ...]]] | bool | None = None
+        self.compiled_outputs: tuple[float, ...] = ()
+        self.layer_offsets: list[int] = []
+        self._digest: str | None = None
+        # слои общие с клонами и копируются перед изменением нейронов
+        self.shared_layers = False
 
     def __hash__(self) -> int:
         return hash(sum(hash(y) for x in self.layers for y in x))
@@ -186,6 +414,7 @@ class Brain:
     def dump(self, **kwargs) -> BrainDescription:
         data = {
             "layers": [[neuron.dump() for neuron in layer] for layer in self.layers],
+            "activations": self.activations,
             "generation": self.generation,
             "score": self.score
         }
@@ -194,9 +423,55 @@ class Brain:
         data.update(kwargs)
         return data
 
-    def dump_to_file(self, path: str, **kwargs) -> None:
-        with open(path, 'w') as file:
-            json.dump(self.dump(**kwargs), file, indent = 4)
+    # при weight_size = 4 веса округляются, и у загруженного мозга будет другой отпечаток,
+    # поэтому библиотека и кэш счета работают только с мозгами, сохраненными в double
+    def dump_to_bytes(self, weight_size: int = 8, **kwargs) -> bytes:
+        metadata = {"activations": self.activations}
+        if self._name is not None:
+            metadata["name"] = self._name
+        metadata.update(kwargs)
+        metadata = json.dumps(metadata).encode()
+
+        class_names = sorted({neuron.__class__.__name__ for layer in self.layers for neuron in layer})
+        class_indexes = {name: index for index, name in enumerate(class_names)}
+        classes = "\n".join(class_names).encode()
+
+        parts = [
+            BrainFormat.header.pack(
+                BrainFormat.magic,
+                BrainFormat.version,
+                weight_size,
+                0,
+                self.generation,
+                self.score,
+                len(metadata),
+                len(classes)
+            ),
+            metadata,
+            classes,
+            BrainFormat.counter.pack(len(self.layers))
+        ]
+        for layer in self.layers:
+            parts.append(BrainFormat.counter.pack(len(layer)))
+            for neuron in layer:
+                parts.append(BrainFormat.neuron.pack(
+                    class_indexes[neuron.__class__.__name__],
+                    neuron.inputs_amount,
+                    neuron.value if isinstance(neuron, OutputNeuron) else 0
+                ))
+        length = sum(len(part) for part in parts)
+        parts.append(bytes(-length % BrainFormat.alignment))
+
+        weights = array(BrainFormat.weight_types[weight_size],
+                        [weight for layer in self.layers for neuron in layer for weight in neuron.input_weights])
+        if sys.byteorder != "little":
+            weights.byteswap()
+        parts.append(weights.tobytes())
+        return b"".join(parts)
+
+    def dump_to_file(self, path: str, weight_size: int = 8, **kwargs) -> None:
+        with open(path, "wb") as file:
+            file.write(self.dump_to_bytes(weight_size, **kwargs))
 
     @classmethod
     def load(cls, data: dict) -> Self:
@@ -214,18 +489,125 @@ class Brain:
             layer = []
             brain.layers.append(layer)
             for neuron_description in layer_description:
-                neuron_class = getattr(sys.modules[__name__], neuron_description.pop("class"))
-                neuron = neuron_class(**neuron_description)
+                neuron_class = Neuron.classes[neuron_description["class"]]
+                neuron = neuron_class(**{key: value for key, value in neuron_description.items() if key != "class"})
+                layer.append(neuron)
+        if "activations" in data:
+            brain.set_activations(data["activations"])
+        return brain
+
+    # буфер не копируется: заголовок и веса читаются напрямую через memoryview
+    @classmethod
+    def load_from_buffer(cls, buffer: bytes | memoryview | mmap.mmap) -> Self:
+        view = memoryview(buffer)
+        (magic, version, weight_size, _, generation, score,
+         metadata_length, classes_length) = BrainFormat.header.unpack_from(view, 0)
+        if magic != BrainFormat.magic:
+            raise ValueError("Buffer does not contain a binary brain")
+        if version > BrainFormat.version:
+            raise ValueError(f"Unsupported brain format version: {version}")
+        offset = BrainFormat.header.size
+
+        metadata = json.loads(str(view[offset:offset + metadata_length], "utf-8"))
+        offset += metadata_length
+        class_names = str(view[offset:offset + classes_length], "utf-8").split("\n")
+        offset += classes_length
+
+        (layers_amount,) = BrainFormat.counter.unpack_from(view, offset)
+        offset += BrainFormat.counter.size
+        layer_descriptions = []
+        for _ in range(layers_amount):
+            (neurons_amount,) = BrainFormat.counter.unpack_from(view, offset)
+            offset += BrainFormat.counter.size
+            layer_descriptions.append(list(BrainFormat.neuron.iter_unpack(
+                view[offset:offset + neurons_amount * BrainFormat.neuron.size]
+            )))
+            offset += neurons_amount * BrainFormat.neuron.size
+        offset += -offset % BrainFormat.alignment
+
+        weights_amount = sum(x[1] for layer in layer_descriptions for x in layer)
+        weights_block = view[offset:offset + weights_amount * weight_size].cast(BrainFormat.weight_types[weight_size])
+        if sys.byteorder == "little":
+            weights = weights_block
+        else:
+            weights = array(BrainFormat.weight_types[weight_size], weights_block)
+            weights.byteswap()
+
+        brain = cls(generation, score, metadata.get("name"))
+        weight_index = 0
+        for layer_description in layer_descriptions:
+            layer = []
+            brain.layers.append(layer)
+            for class_index, inputs_amount, value in layer_description:
+                neuron_class = Neuron.classes[class_names[class_index]]
+                input_weights = weights[weight_index:weight_index + inputs_amount]
+                weight_index += inputs_amount
+                if issubclass(neuron_class, OutputNeuron):
+                    neuron = neuron_class(input_weights, value)
+                else:
+                    neuron = neuron_class(input_weights)
                 layer.append(neuron)
+        if "activations" in metadata:
+            brain.set_activations(metadata["activations"])
+        weights_block.release()
+        view.release()
         return brain
 
+    # json-файлы старого формата тоже загружаются
     @classmethod
     def load_from_file(cls, path: str) -> Self:
-        with open(path, 'r') as file:
-            brain = cls.load(json.load(file))
+        with open(path, "rb") as file:
+            if file.read(len(BrainFormat.magic)) == BrainFormat.magic:
+                with mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+                    brain = cls.load_from_buffer(buffer)
+            else:
+                file.seek(0)
+                brain = cls.load(json.load(file))
         return brain
 
+    def prepare_matrices(self) -> None:
+        self.matrices = []
+        self.history = []
+        if all(len({neuron.activation for neuron in layer}) == 1 for layer in self.layers):
+            for index, layer in enumerate(self.layers):
+                matrix = LayerMatrix(layer, index == 0, self.lookup_activations)
+                self.matrices.append(matrix)
+                self.history.append(np.zeros((max(matrix.history_depth, 1), matrix.neurons_amount)))
+        self.output_values = [neuron.value for neuron in self.layers[-1]]
+
+    def prepare_compiled(self) -> None:
+        compiled = None
+        if self.compile_inference:
+            compiled = BrainCompiler.compile(self)
+        if compiled is None:
+            self.compiled = False
+        else:
+            self.compiled = compiled
+            self.compiled_outputs = tuple(0.0 for layer in self.layers for _ in layer)
+            self.layer_offsets = [0]
+            for layer in self.layers[:-1]:
+                self.layer_offsets.append(self.layer_offsets[-1] + len(layer))
+
     def process(self, inputs: list[float]) -> None:
+        if self.compiled is None:
+            self.prepare_compiled()
+        if self.compiled:
+            self.output, self.compiled_outputs = self.compiled(inputs)
+            return
+
+        if self.matrices is None:
+            self.prepare_matrices()
+
+        if self.matrices:
+            values = np.asarray(inputs, dtype = float)
+            for matrix, history in zip(self.matrices, self.history):
+                values = matrix.process(values, history)
+            self.output = self.output_values[int(values.argmax())]
+        else:
+            self.process_neurons(inputs)
+
+    def process_neurons(self, inputs: list[float]) -> None:
+        self.unshare_layers()
         for index, neuron in enumerate(self.layers[0]):
             neuron.process(inputs[index: index + 1])
         inputs = [x.output for x in self.layers[0]]
@@ -237,6 +619,56 @@ class Brain:
 
         self.output = max(self.layers[-1]).value
 
+    def get_neuron_output(self, layer_index: int, neuron_index: int) -> float:
+        if self.compiled:
+            output = self.compiled_outputs[self.layer_offsets[layer_index] + neuron_index]
+        elif self.matrices:
+            output = float(self.history[layer_index][0][neuron_index])
+        else:
+            output = self.layers[layer_index][neuron_index].output
+        return output
+
+    # выход мозга зависит только от входов - в нем нет нейронов с обратной связью
+    @property
+    def stateless(self) -> bool:
+        return not any(isinstance(neuron, FeedbackNeuron) for layer in self.layers for neuron in layer)
+
+    # функции активации слоев
+    @property
+    def activations(self) -> list[str]:
+        return [layer[0].activation.name for layer in self.layers]
+
+    def set_activations(self, names: list[str]) -> None:
+        self.unshare_layers()
+        self.matrices = None
+        self.compiled = None
+        self._digest = None
+        for layer, name in zip(self.layers, names):
+            activation = Activation.get(name)
+            for neuron in layer:
+                neuron.activation = activation
+
+    def unshare_layers(self) -> None:
+        if self.shared_layers:
+            self.layers = [[neuron.copy() for neuron in layer] for layer in self.layers]
+            self.shared_layers = False
+
+    # копия, разделяющая с исходным мозгом нейроны и матрицы весов, состояние вычислений, возраст и счет у нее свои
+    # скомпилированная функция не переносится: в поколении клон считается матрицами Population,
+    # и BrainMap должен читать выходы из их истории, а вне поколения функция берется из кэша BrainCompiler
+    def clone(self) -> Self:
+        brain = self.__class__(self.generation, self.default_score, self._name)
+        brain.layers = self.layers
+        brain.shared_layers = True
+        self.shared_layers = True
+        brain._digest = self._digest
+
+        if self.matrices is not None:
+            brain.matrices = self.matrices
+            brain.history = [np.zeros_like(history) for history in self.history]
+            brain.output_values = self.output_values
+        return brain
+
     def mutate(self) -> Self:
         new_brain = self.__class__(self.generation, self.default_score, self.name)
         new_brain.layers = [[neuron.mutate() for neuron in layer] for layer in self.layers]
@@ -250,9 +682,27 @@ class Brain:
             name = self._name
         return name
 
+    # устойчивый между запусками отпечаток содержимого мозга: классов нейронов и их весов
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            digest = hashlib.blake2b(digest_size = 16)
+            for layer in self.layers:
+                digest.update(struct.pack("<I", len(layer)))
+                for neuron in layer:
+                    digest.update(neuron.__class__.__name__.encode())
+                    digest.update(struct.pack(f"<I{neuron.inputs_amount}d", neuron.inputs_amount, *neuron.input_weights))
+                    if isinstance(neuron, OutputNeuron):
+                        digest.update(struct.pack("<i", neuron.value))
+                    # функция активации по умолчанию не учитывается, чтобы не менять отпечатки старых мозгов
+                    if neuron.activation.name != neuron.default_activation:
+                        digest.update(neuron.activation.name.encode())
+            self._digest = digest.hexdigest()
+        return self._digest
+
     @property
     def save_name(self) -> str:
-        return f"{hash(self)}.{self.file_extension}"
+        return f"{self.digest}.{self.file_extension}"
 
     @property
     def pretty_score(self) -> float:
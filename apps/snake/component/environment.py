@@ -0,0 +1,192 @@
+import random
+from typing import Sequence
+
+import numpy as np
+
+from apps.snake.component.map import Map, MapGeometry
+from apps.snake.component.snake import DeathCause, Snake
+
+
+# много независимых змей, которые ходят одновременно
+# состояние хранится массивами по всем змеям сразу: головы, направления, голод, тела и слои занятости
+# правила те же, что у Arena и Snake: при одинаковых зернах и действиях змеи двигаются так же
+class VectorEnvironment:
+    # действие - поворот относительно текущего направления, как выход мозга
+    actions = (-1, 0, 1)
+
+    def __init__(
+            self,
+            geometry: MapGeometry,
+            fixed_food_position: tuple[int, int] | None = Map.default_fixed_food_position
+    ) -> None:
+        self.geometry = geometry
+        self.geometry.prepare_sector_tables()
+        reference_map = Map(self.geometry, fixed_food_position)
+        self.fixed_food_cell = reference_map.fixed_food_cell
+        self.cell_offsets = np.array(self.geometry.cell_offsets)
+        self.borders = np.frombuffer(self.geometry.borders, dtype = np.uint8).astype(bool)
+        self.all_directions_amount = Map.all_directions_amount
+        start_direction_offset = -(Map.directions_amount // 2)
+        self.sensor_offsets = np.arange(start_direction_offset, Map.directions_amount + start_direction_offset)
+        self.capacity = len(self.geometry.free_cells)
+
+        self.amount = 0
+        self.generators: list[random.Random] = []
+        self.heads: np.ndarray | None = None
+        self.directions: np.ndarray | None = None
+        self.starvation: np.ndarray | None = None
+        self.ages: np.ndarray | None = None
+        self.alive: np.ndarray | None = None
+        self.death_causes: np.ndarray | None = None
+        # тела - кольцевые буферы, голова сдвигается к началу буфера
+        self.bodies: np.ndarray | None = None
+        self.head_positions: np.ndarray | None = None
+        self.lengths: np.ndarray | None = None
+        self.occupancy: np.ndarray | None = None
+        self.food_cells: np.ndarray | None = None
+        # свободные клетки каждой змеи: массив клеток и позиции клеток в нем, как у FreeCells
+        self.free_cells: np.ndarray | None = None
+        self.free_positions: np.ndarray | None = None
+        self.free_amounts: np.ndarray | None = None
+
+    # берется у Snake при каждом обращении, чтобы изменение параметра змей (например, в sweep) касалось и среды
+    @property
+    def max_starvation_by_segment(self) -> float:
+        return Snake.max_starvation_by_segment
+
+    # seeds - зерна генераторов еды, None - используется общий генератор random, как у Map
+    def reset(self, amount: int, seeds: Sequence[int] | None = None) -> np.ndarray:
+        self.amount = amount
+        if seeds is None:
+            # noinspection PyTypeChecker
+            self.generators = [random] * self.amount
+        else:
+            self.generators = [random.Random(seed) for seed in seeds]
+
+        center = self.geometry.center_cell
+        self.heads = np.full(self.amount, center)
+        self.directions = np.zeros(self.amount, dtype = int)
+        self.starvation = np.zeros(self.amount, dtype = int)
+        self.ages = np.zeros(self.amount, dtype = int)
+        self.alive = np.ones(self.amount, dtype = bool)
+        self.death_causes = np.full(self.amount, -1)
+        self.bodies = np.zeros((self.amount, self.capacity), dtype = int)
+        self.bodies[:, 0] = center
+        self.head_positions = np.zeros(self.amount, dtype = int)
+        self.lengths = np.ones(self.amount, dtype = int)
+        self.occupancy = np.zeros((self.amount, self.geometry.cells_amount), dtype = bool)
+        self.food_cells = np.full(self.amount, -1)
+
+        template = self.geometry.free_cells
+        self.free_cells = np.tile(np.array(template.cells), (self.amount, 1))
+        self.free_positions = np.tile(np.array(template.positions), (self.amount, 1))
+        self.free_amounts = np.full(self.amount, len(template))
+
+        indices = np.arange(self.amount)
+        self.occupy(indices, self.heads)
+        for index in indices:
+            self.place_food(index)
+        return self.get_observations()
+
+    def release(self, indices: np.ndarray, cells: np.ndarray) -> None:
+        self.occupancy[indices, cells] = False
+        positions = self.free_amounts[indices]
+        self.free_cells[indices, positions] = cells
+        self.free_positions[indices, cells] = positions
+        self.free_amounts[indices] += 1
+
+    def occupy(self, indices: np.ndarray, cells: np.ndarray) -> None:
+        self.occupancy[indices, cells] = True
+        positions = self.free_positions[indices, cells]
+        last_cells = self.free_cells[indices, self.free_amounts[indices] - 1]
+        self.free_cells[indices, positions] = last_cells
+        self.free_positions[indices, last_cells] = positions
+        self.free_positions[indices, cells] = -1
+        self.free_amounts[indices] -= 1
+
+    def place_food(self, index: int) -> None:
+        position = self.generators[index].randint(0, self.free_amounts[index] - 1)
+        cell = self.free_cells[index, position]
+        if self.fixed_food_cell is not None and self.free_positions[index, self.fixed_food_cell] >= 0:
+            cell = self.fixed_food_cell
+        self.food_cells[index] = cell
+
+    # для каждой змеи: датчики границы, тела и еды по трем доступным направлениям, как Snake.get_inputs
+    # клетки и веса нужных секторов собираются из сжатых таблиц геометрии и суммируются по секторам,
+    # поэтому стоимость зависит от размера секторов, а не от размера карты
+    def get_observations(self) -> np.ndarray:
+        geometry = self.geometry
+        directions = ((self.directions[:, None] + self.sensor_offsets + self.all_directions_amount)
+                      % self.all_directions_amount)
+        heads = self.heads[:, None]
+        starts = geometry.sector_starts[heads, directions].ravel()
+        lengths = geometry.sector_lengths[heads, directions].ravel()
+        # начала секторов в собранных массивах, секторы не бывают пустыми, поэтому начала не повторяются
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+        cells = geometry.sector_cells[positions]
+        weights = geometry.sector_cell_weights[positions]
+        sensors_amount = len(self.sensor_offsets)
+        snakes = np.repeat(np.arange(self.amount), lengths.reshape(self.amount, sensors_amount).sum(axis = 1))
+        segments = np.add.reduceat(weights * self.occupancy[snakes, cells], offsets)
+        food = np.add.reduceat(weights * (cells == self.food_cells[snakes]), offsets)
+        borders = geometry.sector_border_values[heads, directions]
+        observations = np.concatenate((borders, segments.reshape(self.amount, sensors_amount),
+                                       food.reshape(self.amount, sensors_amount)), axis = 1)
+        observations[~self.alive] = 0
+        return observations
+
+    # возвращает наблюдения, награды (1 - змея поела) и маску завершенных змей
+    # действия завершенных змей не учитываются
+    def step(self, actions: Sequence[int] | np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        actions = np.asarray(actions)
+        if actions.shape != (self.amount,):
+            raise ValueError(f"Expected {self.amount} actions, got an array of shape {actions.shape}")
+        if not np.isin(actions, self.actions).all():
+            raise ValueError(f"Actions must be one of {self.actions}")
+        active = np.flatnonzero(self.alive)
+        rewards = np.zeros(self.amount)
+
+        self.directions[active] = (self.directions[active] + actions[active]
+                                   + self.all_directions_amount) % self.all_directions_amount
+        next_cells = self.heads[active] + self.cell_offsets[self.directions[active]]
+        border_collision = self.borders[next_cells]
+        segment_collision = self.occupancy[active, next_cells]
+        starvation_death = self.starvation[active] >= self.max_starvation_by_segment * self.lengths[active] - 1
+        death = border_collision | segment_collision | starvation_death
+
+        dead = active[death]
+        self.alive[dead] = False
+        self.death_causes[dead] = np.select(
+            (border_collision[death], segment_collision[death]),
+            (DeathCause.BORDER, DeathCause.SEGMENT),
+            DeathCause.STARVATION
+        )
+
+        survivors = active[~death]
+        next_cells = next_cells[~death]
+        grow = self.food_cells[survivors] == next_cells
+        # хвост освобождается до того, как занимается клетка головы, как в Snake.move
+        movers = survivors[~grow]
+        tail_positions = (self.head_positions[movers] + self.lengths[movers] - 1) % self.capacity
+        self.release(movers, self.bodies[movers, tail_positions])
+        self.lengths[survivors[grow]] += 1
+        self.head_positions[survivors] = (self.head_positions[survivors] - 1) % self.capacity
+        self.bodies[survivors, self.head_positions[survivors]] = next_cells
+        self.heads[survivors] = next_cells
+        self.occupy(survivors, next_cells)
+
+        eaters = survivors[grow]
+        self.starvation[survivors[~grow]] += 1
+        self.starvation[eaters] = 0
+        rewards[eaters] = 1
+        for index in eaters:
+            self.place_food(index)
+
+        self.ages[active] += 1
+        return self.get_observations(), rewards, ~self.alive
+
+    # счет, как у Snake.get_score
+    @property
+    def scores(self) -> np.ndarray:
+        return self.lengths + self.ages * 2 / self.max_starvation_by_segment / self.lengths / (1 + self.lengths)
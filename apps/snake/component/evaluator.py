@@ -0,0 +1,99 @@
+import multiprocessing
+import multiprocessing.pool
+
+from apps.snake.component.arena import Arena
+from apps.snake.component.brain import Brain
+from apps.snake.component.map import Map, MapGeometry
+from apps.snake.component.snake import Snake
+
+
+# (индекс арены, мозг в двоичном формате, зерно еды)
+EvaluationTask = tuple[int, bytes, int]
+# (индекс арены, счет, возраст, причина смерти, пропущенные ходы)
+EvaluationResult = tuple[int, float, int, int | None, int]
+
+# карта и настройки процесса-исполнителя, задаются при его запуске
+worker_map: Map | None = None
+worker_cycle_detection = False
+
+
+def prepare_worker(
+        tiles_in_radius: int,
+        border_thickness: int,
+        fixed_food_position: tuple[int, int] | None,
+        cycle_detection: bool
+) -> None:
+    global worker_map, worker_cycle_detection
+    worker_map = Map(MapGeometry.get(tiles_in_radius, border_thickness), fixed_food_position)
+    worker_cycle_detection = cycle_detection
+
+
+# прогоняет одну змею до смерти, результат зависит только от мозга и зерна
+def evaluate(task: EvaluationTask) -> EvaluationResult:
+    index, payload, seed = task
+    world_map = Map(worker_map.geometry, worker_map.fixed_food_position, seed)
+    arena = Arena(Snake(Brain.load_from_buffer(payload), world_map, worker_cycle_detection))
+    while arena.snake.alive:
+        arena.perform()
+    return index, arena.snake.get_score(), arena.snake.age, arena.snake.death_cause, arena.snake.skipped_ticks
+
+
+def evaluate_chunk(tasks: list[EvaluationTask]) -> list[EvaluationResult]:
+    return [evaluate(task) for task in tasks]
+
+
+# оценивает арены поколения в пуле процессов
+# исполнители получают мозг в двоичном формате и зерно еды, а возвращают счет, возраст и причину смерти
+class PoolEvaluator:
+    # сколько результатов ждать за один вызов collect, остальные забираются, только если уже готовы
+    wait_timeout = 0.01
+    # на каждый процесс приходится несколько пачек задач, чтобы процессы не простаивали в конце поколения
+    chunks_by_process = 4
+
+    def __init__(self, processes: int, reference_map: Map, cycle_detection: bool = False) -> None:
+        self.processes = processes
+        # spawn не копирует состояние окна и графического контекста родительского процесса
+        context = multiprocessing.get_context("spawn")
+        self.pool = context.Pool(
+            self.processes,
+            prepare_worker,
+            (
+                reference_map.geometry.tiles_in_radius,
+                reference_map.geometry.border_thickness,
+                reference_map.fixed_food_position,
+                cycle_detection
+            )
+        )
+        self.results: multiprocessing.pool.IMapIterator | None = None
+        self.tasks_amount = 0
+        self.results_amount = 0
+
+    def submit(self, tasks: list[EvaluationTask]) -> None:
+        self.tasks_amount = len(tasks)
+        self.results_amount = 0
+        # задачи делятся на пачки вручную: ожидание со временем есть только у итератора с пачками из одной задачи
+        chunk_size = max(1, len(tasks) // (self.processes * self.chunks_by_process))
+        chunks = [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+        self.results = self.pool.imap_unordered(evaluate_chunk, chunks)
+
+    @property
+    def finished(self) -> bool:
+        return self.results_amount >= self.tasks_amount
+
+    # забирает готовые результаты, не дожидаясь всего поколения
+    def collect(self) -> list[EvaluationResult]:
+        results = []
+        timeout = self.wait_timeout
+        while not self.finished:
+            try:
+                chunk_results = self.results.next(timeout)
+            except multiprocessing.TimeoutError:
+                break
+            results.extend(chunk_results)
+            self.results_amount += len(chunk_results)
+            timeout = 0
+        return results
+
+    def close(self) -> None:
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,269 @@
+import multiprocessing
+import multiprocessing.process
+import multiprocessing.queues
+import queue
+import random
+
+from apps.snake.component.brain import Brain
+from apps.snake.component.map import Map, MapGeometry
+from apps.snake.component.trainer import Trainer
+from apps.snake.service.library import BrainLibrary
+
+
+class ReportType:
+    # поколение острова завершено, данные - счета переносимых мозгов
+    GENERATION = 0
+    # тренировка острова завершена, данные - мозги результата в двоичном формате
+    RESULT = 1
+
+
+# (тип сообщения, остров, поколение, данные)
+IslandReport = tuple[int, int, int, list[float] | list[bytes]]
+# (радиус мира, толщина границы, клетка постоянной еды, зерно еды)
+MapDescription = tuple[int, int, tuple[int, int] | None, int | None]
+# (количество поколений, размер поколения на мозг, количество переносимых мозгов)
+TrainingDescription = tuple[int, int, int]
+
+
+# тренер острова: каждые migration_interval поколений отправляет лучшие мозги соседям
+# и заменяет худшие переносимые мозги пришедшими, не дожидаясь соседей
+class IslandTrainer(Trainer):
+    # острова не пишут общие контрольную точку и журнал производительности и не записывают эпизоды
+    checkpoint_interval = 0
+    record_episodes = False
+
+    def __init__(
+            self,
+            reference_map: Map,
+            inbox: multiprocessing.queues.Queue,
+            neighbours: list[multiprocessing.queues.Queue],
+            migration_interval: int,
+            migrants_amount: int
+    ) -> None:
+        super().__init__(reference_map, None)
+        self.performance_log = None
+        self.inbox = inbox
+        self.neighbours = neighbours
+        self.migration_interval = migration_interval
+        self.migrants_amount = migrants_amount
+        self.received_migrants = 0
+
+    def prepare_training_arenas(self) -> None:
+        trained_generations = self.reference_brains[0].generation - self.start_generation
+        if self.migration_interval > 0 and trained_generations > 0 \
+                and trained_generations % self.migration_interval == 0:
+            self.migrate()
+        super().prepare_training_arenas()
+
+    # сообщение - список мозгов в двоичном формате
+    def migrate(self) -> None:
+        payloads = [brain.dump_to_bytes() for brain in self.reference_brains[:self.migrants_amount]]
+        for neighbour in self.neighbours:
+            neighbour.put(payloads)
+
+        migrants = []
+        while True:
+            try:
+                migrants.extend(Brain.load_from_buffer(payload) for payload in self.inbox.get_nowait())
+            except queue.Empty:
+                break
+        # хотя бы один свой мозг остается на острове
+        migrants_amount = min(self.migrants_amount, self.reference_brains_amount - 1)
+        migrants = sorted(migrants, key = lambda x: x.score, reverse = True)[:migrants_amount]
+
+        generation = self.reference_brains[0].generation
+        for brain in migrants:
+            brain.generation = generation
+        kept_amount = min(len(self.reference_brains), self.reference_brains_amount - len(migrants))
+        self.reference_brains = [*self.reference_brains[:kept_amount], *migrants]
+        self.received_migrants += len(migrants)
+
+
+def run_island(
+        index: int,
+        map_description: MapDescription,
+        training_description: TrainingDescription,
+        trainer_settings: dict[str, bool],
+        payloads: list[bytes],
+        seed: int,
+        inbox: multiprocessing.queues.Queue,
+        neighbours: list[multiprocessing.queues.Queue],
+        migration_interval: int,
+        migrants_amount: int,
+        reports: multiprocessing.queues.Queue
+) -> None:
+    random.seed(seed)
+    tiles_in_radius, border_thickness, fixed_food_position, food_seed = map_description
+    reference_map = Map(MapGeometry.get(tiles_in_radius, border_thickness), fixed_food_position, food_seed)
+    trainer = IslandTrainer(reference_map, inbox, neighbours, migration_interval, migrants_amount)
+    for name, value in trainer_settings.items():
+        setattr(trainer, name, value)
+
+    generations_amount, generation_size_by_brain, reference_brains_amount = training_description
+    trainer.start(
+        [Brain.load_from_buffer(payload) for payload in payloads],
+        generations_amount,
+        generation_size_by_brain,
+        reference_brains_amount
+    )
+    while trainer.training:
+        trainer.train_generation()
+        reports.put((
+            ReportType.GENERATION,
+            index,
+            trainer.reference_brains[0].generation,
+            [brain.score for brain in trainer.reference_brains]
+        ))
+
+    # мигранты для уже завершившихся соседей никто не заберет, процесс не должен их дожидаться
+    for neighbour in neighbours:
+        neighbour.cancel_join_thread()
+    generation = trainer.reference_brains[0].generation
+    reports.put((ReportType.RESULT, index, generation, [brain.dump_to_bytes() for brain in trainer.result_brains]))
+
+
+# несколько независимых популяций в отдельных процессах, у каждой свои отбор и мутация
+# лучшие мозги переходят между островами раз в migration_interval поколений, поэтому острова почти не ждут друг друга
+class IslandModel:
+    # ring - каждый остров отправляет мигрантов следующему, all - всем остальным
+    topologies = ("ring", "all")
+    # сколько ждать сообщения за один вызов collect
+    wait_timeout = 0.1
+
+    def __init__(
+            self,
+            reference_map: Map,
+            brain_library: BrainLibrary,
+            islands_amount: int,
+            migration_interval: int = 10,
+            migrants_amount: int = 2,
+            topology: str = "ring"
+    ) -> None:
+        if topology not in self.topologies:
+            raise ValueError(f"Unknown island topology: {topology}")
+        self.reference_map = reference_map
+        self.brain_library = brain_library
+        self.islands_amount = islands_amount
+        self.migration_interval = migration_interval
+        self.migrants_amount = migrants_amount
+        self.topology = topology
+        # настройки тренеров островов, по умолчанию - как у Trainer
+        self.trainer_settings = {
+            name: getattr(Trainer, name)
+            for name in ("population_inference", "save_best_brains", "cycle_detection", "early_stopping")
+        }
+
+        self.processes: list[multiprocessing.process.BaseProcess] = []
+        # входящие мигранты каждого острова
+        self.inboxes: list[multiprocessing.queues.Queue] = []
+        self.reports: multiprocessing.queues.Queue | None = None
+        # последнее поколение и счета переносимых мозгов каждого острова
+        self.generations: list[int] = []
+        self.scores: list[list[float]] = []
+        # остров -> мозги результата
+        self.results: dict[int, list[Brain]] = {}
+
+    def get_neighbours(self, index: int) -> list[int]:
+        if self.islands_amount < 2:
+            neighbours = []
+        elif self.topology == "ring":
+            neighbours = [(index + 1) % self.islands_amount]
+        else:
+            neighbours = [x for x in range(self.islands_amount) if x != index]
+        return neighbours
+
+    def start(
+            self,
+            reference_brains: list[Brain],
+            generations_amount: int,
+            generation_size_by_brain: int,
+            reference_brains_amount: int
+    ) -> None:
+        # spawn не копирует состояние окна и графического контекста родительского процесса
+        context = multiprocessing.get_context("spawn")
+        # очереди должны жить, пока процессы их не откроют
+        self.inboxes = [context.Queue() for _ in range(self.islands_amount)]
+        self.reports = context.Queue()
+        self.generations = [reference_brains[0].generation] * self.islands_amount
+        self.scores = [[] for _ in range(self.islands_amount)]
+        self.results = {}
+
+        geometry = self.reference_map.geometry
+        map_description = (
+            geometry.tiles_in_radius,
+            geometry.border_thickness,
+            self.reference_map.fixed_food_position,
+            self.reference_map.food_seed
+        )
+        training_description = (generations_amount, generation_size_by_brain, reference_brains_amount)
+        payloads = [brain.dump_to_bytes() for brain in reference_brains]
+        self.processes = []
+        for index in range(self.islands_amount):
+            process = context.Process(
+                target = run_island,
+                args = (
+                    index,
+                    map_description,
+                    training_description,
+                    self.trainer_settings,
+                    payloads,
+                    random.getrandbits(32),
+                    self.inboxes[index],
+                    [self.inboxes[x] for x in self.get_neighbours(index)],
+                    self.migration_interval,
+                    self.migrants_amount,
+                    self.reports
+                ),
+                name = f"island {index}",
+                daemon = True
+            )
+            process.start()
+            self.processes.append(process)
+
+    @property
+    def training(self) -> bool:
+        return len(self.results) < self.islands_amount
+
+    # забирает сообщения островов, когда все острова закончили, сохраняет их мозги в библиотеку
+    def collect(self) -> list[IslandReport]:
+        reports = []
+        timeout = self.wait_timeout
+        while self.training:
+            try:
+                report = self.reports.get(timeout = timeout)
+            except queue.Empty:
+                for index, process in enumerate(self.processes):
+                    if process.exitcode not in (None, 0):
+                        self.close()
+                        raise RuntimeError(f"Island {index} stopped with exit code {process.exitcode}")
+                break
+            report_type, index, generation, data = report
+            self.generations[index] = generation
+            if report_type == ReportType.GENERATION:
+                self.scores[index] = data
+            else:
+                self.results[index] = [Brain.load_from_buffer(payload) for payload in data]
+            reports.append(report)
+            timeout = 0
+
+        if not self.training and len(self.processes) > 0:
+            self.brain_library.save([brain for index in sorted(self.results) for brain in self.results[index]])
+            self.close()
+        return reports
+
+    @property
+    def best_brain(self) -> Brain | None:
+        brains = [brain for brains in self.results.values() for brain in brains]
+        if len(brains) > 0:
+            best_brain = max(brains, key = lambda x: x.score)
+        else:
+            best_brain = None
+        return best_brain
+
+    def close(self) -> None:
+        for process in self.processes:
+            process.join(self.wait_timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.inboxes = []
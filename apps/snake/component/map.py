@@ -1,98 +1,231 @@
-import copy
+import array
 import operator
 import random
 from collections import deque
-from typing import Callable, TYPE_CHECKING
+from typing import Callable, Iterable
 
+import numpy as np
 
-if TYPE_CHECKING:
-    from snake.component.world import World
 
 Comparator = Callable[[float, float], bool]
 SectorFunction = tuple[Comparator, float]
 
 
-class Map:
-    side_length: int
-    square_side_length: int
-    default_map: list[list[bool | None]] = None
-    sector_cache: dict[tuple[int, int, int], set[tuple[int, int]]] = {}
-
-    def __init__(self, world: "World") -> None:
-        if self.default_map is None:
-            self.__class__.side_length = world.tiles_in_radius + world.border_thickness
-            self.__class__.square_side_length = self.side_length * 2 - 1
-            self.__class__.default_map = [[None for _ in range(self.square_side_length)]
-                                          for _ in range(self.square_side_length)]
-
-        self.surface = copy.deepcopy(self.default_map)
-        self.borders = copy.deepcopy(self.default_map)
-        self.snake = copy.deepcopy(self.default_map)
-        self.food = copy.deepcopy(self.default_map)
-        self.offsets = (
-            (1, 0),
-            (0, 1),
-            (-1, 1),
-            (-1, 0),
-            (0, -1),
-            (1, -1)
-        )
-        self.prepare_submaps(world)
-
-        # y = -0.5x
-        # y = -2x
-        # y = x
-        # {direction: ((>, coeff), (>, coeff))
-        # https://www.desmos.com/calculator/pswa9sn0cw?lang=ru
-        self.sector_functions: tuple[tuple[SectorFunction, SectorFunction], ...] = (
-            ((operator.ge, -0.5), (operator.lt, 1)),
-            ((operator.ge, 1), (operator.gt, -2)),
-            ((operator.le, -2), (operator.gt, -0.5)),
-            ((operator.le, -0.5), (operator.gt, 1)),
-            ((operator.le, 1), (operator.lt, -2)),
-            ((operator.ge, -2), (operator.lt, -0.5))
-        )
-        self.direction_distance_correction = (1, 1, 2**(1 / 2), 1, 1, 2**(1 / 2))
-        self.all_directions_amount = len(self.offsets)
-        # количество направлений для движения змеи
-        self.directions_amount = 3
+# клетки сектора обзора змеи с весами, обратными расстоянию до головы
+class Sector:
+    __slots__ = ("cells", "indices", "weights", "cell_weights", "border_value")
+
+    def __init__(self, cells: tuple[int, ...], weights: tuple[float, ...], borders: bytearray) -> None:
+        self.cells = cells
+        self.indices = np.array(cells, dtype = np.intp)
+        self.weights = np.array(weights, dtype = np.float64)
+        self.cell_weights = dict(zip(cells, weights))
+        # граница неподвижна, поэтому ее датчик считается заранее
+        border_value = 0
+        for cell, weight in zip(cells, weights):
+            if borders[cell]:
+                border_value += weight
+        self.border_value = border_value
+
+    # взвешенная сумма занятых клеток слоя
+    def measure(self, layer: np.ndarray) -> float:
+        return float(self.weights @ layer[self.indices])
+
+    # то же самое по списку занятых клеток - дешевле, когда их меньше, чем клеток в секторе
+    def measure_cells(self, cells: Iterable[int]) -> float:
+        value = 0
+        cell_weights = self.cell_weights
+        for cell in cells:
+            if cell in cell_weights:
+                value += cell_weights[cell]
+        return value
+
+
+# множество свободных клеток с добавлением, удалением и случайным выбором за O(1)
+# клетки лежат в массиве, а их позиции хранятся отдельно
+# при удалении на место клетки переставляется последняя клетка массива
+class FreeCells:
+    __slots__ = ("cells", "positions")
+
+    def __init__(self, cells: list[int], cells_amount: int) -> None:
+        self.cells = cells
+        # -1 - клетка не свободна
+        self.positions = [-1] * cells_amount
+        for position, cell in enumerate(self.cells):
+            self.positions[cell] = position
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __contains__(self, cell: int) -> bool:
+        return self.positions[cell] >= 0
+
+    def copy(self) -> "FreeCells":
+        free_cells = self.__class__.__new__(self.__class__)
+        free_cells.cells = self.cells.copy()
+        free_cells.positions = self.positions.copy()
+        return free_cells
+
+    def add(self, cell: int) -> None:
+        if self.positions[cell] < 0:
+            self.positions[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def remove(self, cell: int) -> None:
+        position = self.positions[cell]
+        if position >= 0:
+            last_cell = self.cells.pop()
+            if last_cell != cell:
+                self.cells[position] = last_cell
+                self.positions[last_cell] = position
+            self.positions[cell] = -1
+
+    def sample(self, generator: random.Random) -> int:
+        return self.cells[generator.randint(0, len(self.cells) - 1)]
+
+
+# неизменяемая часть карты, общая для всех арен с одинаковым размером мира
+# клетки квадратной сетки нумеруются как x * square_side_length + y
+class MapGeometry:
+    offsets = (
+        (1, 0),
+        (0, 1),
+        (-1, 1),
+        (-1, 0),
+        (0, -1),
+        (1, -1)
+    )
+    # y = -0.5x
+    # y = -2x
+    # y = x
+    # {direction: ((>, coeff), (>, coeff))
+    # https://www.desmos.com/calculator/pswa9sn0cw?lang=ru
+    sector_functions: tuple[tuple[SectorFunction, SectorFunction], ...] = (
+        ((operator.ge, -0.5), (operator.lt, 1)),
+        ((operator.ge, 1), (operator.gt, -2)),
+        ((operator.le, -2), (operator.gt, -0.5)),
+        ((operator.le, -0.5), (operator.gt, 1)),
+        ((operator.le, 1), (operator.lt, -2)),
+        ((operator.ge, -2), (operator.lt, -0.5))
+    )
+    direction_distance_correction = (1, 1, 2**(1 / 2), 1, 1, 2**(1 / 2))
+    zobrist_seed = 0
+    # (tiles_in_radius, border_thickness) -> геометрия
+    geometries: dict[tuple[int, int], "MapGeometry"] = {}
+
+    def __init__(self, tiles_in_radius: int, border_thickness: int) -> None:
+        self.tiles_in_radius = tiles_in_radius
+        self.border_thickness = border_thickness
+        self.side_length = self.tiles_in_radius + self.border_thickness
+        self.square_side_length = self.side_length * 2 - 1
+        self.cells_amount = self.square_side_length**2
+        self.cell_offsets = tuple(x * self.square_side_length + y for x, y in self.offsets)
+
+        # клетка принадлежит шестиугольной карте
+        self.on_map = bytearray(self.cells_amount)
+        self.surface = bytearray(self.cells_amount)
+        self.borders = bytearray(self.cells_amount)
+        # клетки плиток в порядке их создания миром - по спирали от центра
+        self.tile_cells: list[int] = []
+        self.prepare_layers(self.tiles_in_radius)
+        self.center_cell = self.tile_cells[0]
+        # клетки, на которых может появиться еда, по возрастанию
+        self.free_cells = FreeCells([cell for cell in range(self.cells_amount) if self.surface[cell]],
+                                    self.cells_amount)
+
+        # направление по смещению клетки
+        self.offset_directions = {offset: direction for direction, offset in enumerate(self.cell_offsets)}
+        self.prepare_zobrist_keys()
+
+        self.sectors: dict[tuple[int, int], Sector] = {}
+        # секторы всех клеток поверхности в сжатом виде, как строки CSR-матрицы, строятся по запросу:
+        # клетки и веса всех секторов подряд, начало и длина сектора [клетка головы, направление] в этих массивах
+        self.sector_cells: np.ndarray | None = None
+        self.sector_cell_weights: np.ndarray | None = None
+        self.sector_starts: np.ndarray | None = None
+        self.sector_lengths: np.ndarray | None = None
+        self.sector_border_values: np.ndarray | None = None
+
+    # случайные ключи для хэша Зобриста состояния змеи: хэш меняется операцией xor с ключом изменившейся части
+    # генератор свой, чтобы не сдвигать последовательность общего генератора random
+    def prepare_zobrist_keys(self) -> None:
+        generator = random.Random(self.zobrist_seed)
+        # сегмент тела в клетке, связанный со следующим к голове сегментом по направлению
+        self.link_keys = [[generator.getrandbits(64) for _ in self.offsets] for _ in range(self.cells_amount)]
+        self.head_keys = [generator.getrandbits(64) for _ in range(self.cells_amount)]
+        self.direction_keys = [generator.getrandbits(64) for _ in self.offsets]
+        self.food_keys = [generator.getrandbits(64) for _ in range(self.cells_amount)]
+
+    @classmethod
+    def get(cls, tiles_in_radius: int, border_thickness: int) -> "MapGeometry":
+        key = (tiles_in_radius, border_thickness)
+        if key not in cls.geometries:
+            cls.geometries[key] = cls(tiles_in_radius, border_thickness)
+        return cls.geometries[key]
 
     # noinspection DuplicatedCode
-    def prepare_submaps(self, world: "World") -> None:
+    def prepare_layers(self, tiles_in_radius: int) -> None:
         x = self.side_length - 1
         y = self.side_length - 1
-        tile = world.all_tiles[0]
-        self.surface[x][y] = tile.is_surface
-        self.borders[x][y] = tile.is_border
-        self.snake[x][y] = False
-        self.food[x][y] = False
-        tile.map_x = x
-        tile.map_y = y
-
-        index = 1
+        self.add_tile(self.get_cell(x, y), True)
+
         for edge_size in range(1, self.side_length):
+            is_surface = edge_size < tiles_in_radius
             y -= 1
             for offset_x, offset_y in self.offsets:
                 for _ in range(edge_size):
                     x += offset_x
                     y += offset_y
-                    tile = world.all_tiles[index]
-                    self.surface[x][y] = tile.is_surface
-                    self.borders[x][y] = tile.is_border
-                    self.snake[x][y] = False
-                    self.food[x][y] = False
-                    tile.map_x = x
-                    tile.map_y = y
-                    index += 1
+                    self.add_tile(self.get_cell(x, y), is_surface)
 
-    def place_food(self) -> None:
-        free_tiles = [(x, y) for x in range(self.square_side_length) for y in range(self.square_side_length)
-                      if self.surface[x][y] and not self.borders[x][y] and not self.snake[x][y]]
-        tile = free_tiles[random.randint(0, len(free_tiles) - 1)]
-        if (10, 10) in free_tiles:
-            tile = (10, 10)
+    def add_tile(self, cell: int, is_surface: bool) -> None:
+        self.on_map[cell] = True
+        self.surface[cell] = is_surface
+        self.borders[cell] = not is_surface
+        self.tile_cells.append(cell)
+
+    def get_cell(self, x: int, y: int) -> int:
+        return x * self.square_side_length + y
+
+    def get_position(self, cell: int) -> tuple[int, int]:
+        return divmod(cell, self.square_side_length)
 
-        self.food[tile[0]][tile[1]] = True
+    # наименьшее количество ходов между клетками без учета препятствий
+    def get_distance(self, cell: int, other_cell: int) -> int:
+        x, y = self.get_position(cell)
+        other_x, other_y = self.get_position(other_cell)
+        offset_x = x - other_x
+        offset_y = y - other_y
+        return (abs(offset_x) + abs(offset_y) + abs(offset_x + offset_y)) // 2
+
+    def get_surface_cell(self, x: int, y: int) -> int | None:
+        if 0 <= x < self.square_side_length and 0 <= y < self.square_side_length and self.surface[self.get_cell(x, y)]:
+            cell = self.get_cell(x, y)
+        else:
+            cell = None
+        return cell
+
+    # заранее посчитанные датчики границы тоже хранятся таблицей [клетка головы, направление]
+    def prepare_sector_tables(self) -> None:
+        if self.sector_cells is None:
+            directions_amount = len(self.offsets)
+            self.sector_starts = np.zeros((self.cells_amount, directions_amount), dtype = np.intp)
+            self.sector_lengths = np.zeros((self.cells_amount, directions_amount), dtype = np.intp)
+            self.sector_border_values = np.zeros((self.cells_amount, directions_amount))
+            cells = []
+            weights = []
+            start = 0
+            for cell in self.free_cells.cells:
+                for direction in range(directions_amount):
+                    sector = self.get_sector(cell, direction)
+                    cells.append(sector.indices)
+                    weights.append(sector.weights)
+                    self.sector_starts[cell, direction] = start
+                    self.sector_lengths[cell, direction] = len(sector.indices)
+                    self.sector_border_values[cell, direction] = sector.border_value
+                    start += len(sector.indices)
+            self.sector_cells = np.concatenate(cells)
+            self.sector_cell_weights = np.concatenate(weights)
 
     def belongs_to_sector(self, head_x: int, head_y: int, direction: int, x: int, y: int) -> bool:
         satisfy = True
@@ -101,13 +234,16 @@ class Map:
             satisfy *= comparator(y, coeff * (x - head_x) + head_y)
         return bool(satisfy)
 
-    def get_sector(self, head_x: int, head_y: int, direction: int) -> set[tuple[int, int]]:
-        cache_key = (head_x, head_y, direction)
-        if cache_key not in self.sector_cache:
+    # сектор считается один раз для каждой пары (клетка, направление) и дальше берется из таблицы
+    def get_sector(self, head_cell: int, direction: int) -> "Sector":
+        cache_key = (head_cell, direction)
+        if cache_key not in self.sectors:
+            head_x, head_y = self.get_position(head_cell)
             directions_amount = 3
+            all_directions_amount = len(self.offsets)
             start_direction_offset = -(directions_amount // 2)
             direction_offsets = range(start_direction_offset, directions_amount + start_direction_offset, 1)
-            neighbour_directions = [(direction + x + self.all_directions_amount) % self.all_directions_amount
+            neighbour_directions = [(direction + x + all_directions_amount) % all_directions_amount
                                     for x in direction_offsets]
             sector = set()
             offsets = self.offsets
@@ -117,12 +253,104 @@ class Map:
             while len(queue) > 0:
                 x, y = queue.popleft()
                 on_map = (0 <= x < self.square_side_length and 0 <= y < self.square_side_length
-                          and self.surface[x][y] is not None)
+                          and self.on_map[self.get_cell(x, y)])
                 if (x, y) not in sector and on_map and self.belongs_to_sector(head_x, head_y, direction, x, y):
                     sector.add((x, y))
                     neighbours = ((x + offsets[neighbour_direction][0], y + offsets[neighbour_direction][1])
                                   for neighbour_direction in neighbour_directions)
                     queue.extend(neighbours)
-            self.sector_cache[cache_key] = sector
 
-        return self.sector_cache[cache_key]
+            # порядок клеток совпадает с прежним обходом множества, чтобы суммы датчиков не менялись
+            cells = tuple(self.get_cell(x, y) for x, y in sector)
+            distances = (((head_x - x)**2 + (head_y - y)**2)**(1 / 2) / self.direction_distance_correction[direction]
+                         for x, y in sector)
+            weights = tuple(1 / distance for distance in distances)
+            self.sectors[cache_key] = Sector(cells, weights, self.borders)
+
+        return self.sectors[cache_key]
+
+
+class Map:
+    offsets = MapGeometry.offsets
+    sector_functions = MapGeometry.sector_functions
+    direction_distance_correction = MapGeometry.direction_distance_correction
+    all_directions_amount = len(offsets)
+    # количество направлений для движения змеи
+    directions_amount = 3
+    default_fixed_food_position = (10, 10)
+
+    # неизменяемые слои берутся из геометрии, у каждой карты свои только слои змеи и еды
+    # fixed_food_position - еда всегда появляется в этой клетке, если она свободна, None - только случайно
+    # food_seed - зерно отдельного генератора для еды, None - используется общий генератор random
+    def __init__(
+            self,
+            geometry: MapGeometry,
+            fixed_food_position: tuple[int, int] | None = default_fixed_food_position,
+            food_seed: int | None = None
+    ) -> None:
+        self.geometry = geometry
+        self.fixed_food_position = fixed_food_position
+        if self.fixed_food_position is not None:
+            self.fixed_food_cell = self.geometry.get_surface_cell(*self.fixed_food_position)
+        else:
+            self.fixed_food_cell = None
+        self.food_seed = food_seed
+        if self.food_seed is not None:
+            self.food_random = random.Random(self.food_seed)
+        else:
+            # noinspection PyTypeChecker
+            self.food_random: random.Random = random
+        self.side_length = self.geometry.side_length
+        self.square_side_length = self.geometry.square_side_length
+        self.cell_offsets = self.geometry.cell_offsets
+        self.surface = self.geometry.surface
+        self.borders = self.geometry.borders
+        self.snake = bytearray(self.geometry.cells_amount)
+        self.food = bytearray(self.geometry.cells_amount)
+        # представления слоев без копирования для векторных датчиков
+        self.snake_values = np.frombuffer(self.snake, dtype = np.uint8)
+        self.food_values = np.frombuffer(self.food, dtype = np.uint8)
+        # клетки с едой, обновляются вместе со слоем
+        self.food_cells: set[int] = set()
+        # клетки поверхности без змеи, обновляются вместе со слоем змеи
+        self.free_cells = self.geometry.free_cells.copy()
+        # клетки размещенной еды по порядку для записи эпизода, None - не записываются
+        self.food_log: array.array | None = None
+
+    # копия продолжает ту же последовательность еды, что и оригинал
+    def copy(self) -> "Map":
+        world_map = self.__class__(self.geometry, self.fixed_food_position, self.food_seed)
+        if self.food_seed is not None:
+            world_map.food_random.setstate(self.food_random.getstate())
+        world_map.snake[:] = self.snake
+        world_map.food[:] = self.food
+        world_map.food_cells = set(self.food_cells)
+        world_map.free_cells = self.free_cells.copy()
+        return world_map
+
+    def occupy(self, cell: int) -> None:
+        self.snake[cell] = True
+        self.free_cells.remove(cell)
+
+    def release(self, cell: int) -> None:
+        self.snake[cell] = False
+        if self.surface[cell]:
+            self.free_cells.add(cell)
+
+    def place_food(self) -> None:
+        # случайное число берется всегда, чтобы последовательность генератора не зависела от закрепленной клетки
+        cell = self.free_cells.sample(self.food_random)
+        if self.fixed_food_cell is not None and self.fixed_food_cell in self.free_cells:
+            cell = self.fixed_food_cell
+
+        self.food[cell] = True
+        self.food_cells.add(cell)
+        if self.food_log is not None:
+            self.food_log.append(cell)
+
+    def remove_food(self, cell: int) -> None:
+        self.food[cell] = False
+        self.food_cells.discard(cell)
+
+    def get_sector(self, head_cell: int, direction: int) -> "Sector":
+        return self.geometry.get_sector(head_cell, direction)
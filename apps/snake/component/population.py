@@ -0,0 +1,96 @@
+import numpy as np
+
+from apps.snake.component.brain import Brain
+
+
+class BrainGroup:
+    # мозги одинаковой топологии, веса которых сложены в общие тензоры
+    def __init__(self, brains: list[Brain]) -> None:
+        self.brains = brains
+        matrices = self.brains[0].matrices
+        self.functions = [matrix.function for matrix in matrices]
+        self.input_layers = [matrix.input_layer for matrix in matrices]
+        self.neurons_amounts = [matrix.neurons_amount for matrix in matrices]
+        self.history_depths = [matrix.history_depth for matrix in matrices]
+        self.output_values = np.array(self.brains[0].output_values)
+
+        self.weights = [np.stack([brain.matrices[index].weights for brain in self.brains])
+                        for index in range(len(matrices))]
+        self.feedback = [np.stack([brain.matrices[index].feedback for brain in self.brains])
+                         if matrix.feedback is not None else None for index, matrix in enumerate(matrices)]
+        self.history = [np.stack([brain.history[index] for brain in self.brains]) for index in range(len(matrices))]
+        # история мозгов становится срезами общих тензоров, чтобы BrainMap видел актуальные выходы
+        for brain_index, brain in enumerate(self.brains):
+            brain.history = [history[brain_index] for history in self.history]
+
+    @staticmethod
+    def get_signature(brain: Brain) -> tuple:
+        return (
+            tuple((matrix.function, matrix.input_layer, matrix.weights.shape, matrix.history_depth)
+                  for matrix in brain.matrices),
+            tuple(brain.output_values)
+        )
+
+    def process(self, indices: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+        # если считаются все мозги группы, выборка по индексам не нужна
+        if len(indices) == len(self.brains):
+            indices = slice(None)
+
+        values = inputs
+        for layer_index, function in enumerate(self.functions):
+            weights = self.weights[layer_index][indices]
+            if self.input_layers[layer_index]:
+                sums = weights * values[:, :self.neurons_amounts[layer_index]]
+            else:
+                sums = (weights @ values[:, :, None])[:, :, 0]
+
+            history = self.history[layer_index]
+            depth = self.history_depths[layer_index]
+            if depth > 0:
+                feedback = self.feedback[layer_index][indices]
+                sums += (feedback * history[indices, :depth].transpose(0, 2, 1)).sum(axis = 2)
+
+            values = function(sums)
+            if history.shape[1] > 1:
+                history[indices, 1:] = history[indices, :-1]
+            history[indices, 0] = values
+
+        return self.output_values[values.argmax(axis = 1)]
+
+
+class Population:
+    # все мозги поколения, обрабатываемые одним вызовом за тик
+    def __init__(self, brains: list[Brain]) -> None:
+        self.brains = brains
+        self.groups: list[BrainGroup] = []
+        # номер группы мозга (-1 - мозг нельзя векторизовать) и его место в группе
+        self.brain_groups = np.full(len(self.brains), -1)
+        self.group_positions = np.zeros(len(self.brains), dtype = int)
+
+        grouped_brains: dict[tuple, list[int]] = {}
+        for index, brain in enumerate(self.brains):
+            if brain.matrices is None:
+                brain.prepare_matrices()
+            if brain.matrices:
+                grouped_brains.setdefault(BrainGroup.get_signature(brain), []).append(index)
+
+        for group_index, indices in enumerate(grouped_brains.values()):
+            self.groups.append(BrainGroup([self.brains[index] for index in indices]))
+            self.brain_groups[indices] = group_index
+            self.group_positions[indices] = range(len(indices))
+
+    def process(self, brain_indices: list[int], inputs: list[list[float]]) -> None:
+        brain_indices = np.asarray(brain_indices, dtype = int)
+        inputs = np.asarray(inputs, dtype = float)
+        brain_groups = self.brain_groups[brain_indices]
+
+        for group_index, group in enumerate(self.groups):
+            mask = brain_groups == group_index
+            if mask.any():
+                group_brain_indices = brain_indices[mask]
+                outputs = group.process(self.group_positions[group_brain_indices], inputs[mask])
+                for brain_index, output in zip(group_brain_indices.tolist(), outputs.tolist()):
+                    self.brains[brain_index].output = output
+
+        for brain_index, brain_inputs in zip(brain_indices[brain_groups < 0].tolist(), inputs[brain_groups < 0]):
+            self.brains[brain_index].process(brain_inputs.tolist())
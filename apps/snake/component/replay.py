@@ -0,0 +1,284 @@
+import array
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from apps.snake.component.arena import Arena
+from apps.snake.component.map import Map, MapGeometry
+from apps.snake.component.snake import Snake
+
+
+# двоичный формат эпизода (little-endian): заголовок, ходы по 2 бита, клетки размещенной еды
+# начальное состояние всегда одинаковое - змея в центре пустой карты смотрит в направлении 0,
+# поэтому вместе с записанной едой ходы однозначно задают весь эпизод
+class EpisodeFormat:
+    magic = b"SNKE"
+    version = 1
+    # магия, версия, радиус мира, толщина границы, голод на сегмент, причина смерти (255 - нет),
+    # поколение, счет, количество ходов, количество размещений еды, отпечаток мозга
+    header = struct.Struct("<4sHHHdBIdII16s")
+    counter = struct.Struct("<I")
+    no_death_cause = 255
+    actions_by_byte = 4
+    action_bits = 2
+
+
+# (ход, клетки тела от головы к хвосту, направление, голод, жива ли змея, причина смерти,
+# клетки с едой, количество уже размещенной еды)
+Keyframe = tuple[int, array.array, int, int, bool, int | None, tuple[int, ...], int]
+
+
+# записанный эпизод змеи: воспроизводится без мозга, поэтому хранится дешево и показывается без повторного прогона
+class Episode:
+    def __init__(
+            self,
+            tiles_in_radius: int,
+            border_thickness: int,
+            max_starvation_by_segment: float,
+            actions: bytes,
+            ticks: int,
+            food_cells: array.array,
+            death_cause: int | None,
+            generation: int,
+            score: float,
+            digest: str
+    ) -> None:
+        self.tiles_in_radius = tiles_in_radius
+        self.border_thickness = border_thickness
+        self.max_starvation_by_segment = max_starvation_by_segment
+        # упакованные ходы, по 4 в байте начиная с младших битов
+        self.actions = actions
+        self.ticks = ticks
+        self.food_cells = food_cells
+        self.death_cause = death_cause
+        self.generation = generation
+        self.score = score
+        self.digest = digest
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(generation={self.generation}, score={self.score}, ticks={self.ticks})"
+
+    # змея должна быть создана с записью ходов
+    @classmethod
+    def from_snake(cls, snake: Snake, generation: int) -> "Episode":
+        geometry = snake.world_map.geometry
+        return cls(
+            geometry.tiles_in_radius,
+            geometry.border_thickness,
+            snake.max_starvation_by_segment,
+            cls.pack_actions(snake.actions),
+            len(snake.actions),
+            array.array('I', snake.world_map.food_log),
+            snake.death_cause,
+            generation,
+            snake.get_score(),
+            snake.brain.digest
+        )
+
+    @staticmethod
+    def pack_actions(actions: bytearray) -> bytes:
+        values = np.zeros(-(-len(actions) // EpisodeFormat.actions_by_byte) * EpisodeFormat.actions_by_byte,
+                          dtype = np.uint8)
+        values[:len(actions)] = np.frombuffer(actions, dtype = np.uint8)
+        shifts = np.arange(EpisodeFormat.actions_by_byte, dtype = np.uint8) * EpisodeFormat.action_bits
+        return (values.reshape(-1, EpisodeFormat.actions_by_byte) << shifts).sum(axis = 1, dtype = np.uint8).tobytes()
+
+    def get_action(self, tick: int) -> int:
+        byte_index, action_index = divmod(tick, EpisodeFormat.actions_by_byte)
+        return (self.actions[byte_index] >> (action_index * EpisodeFormat.action_bits)) & 3
+
+    def dump_to_bytes(self) -> bytes:
+        if self.death_cause is None:
+            death_cause = EpisodeFormat.no_death_cause
+        else:
+            death_cause = self.death_cause
+        return b"".join([
+            EpisodeFormat.header.pack(
+                EpisodeFormat.magic,
+                EpisodeFormat.version,
+                self.tiles_in_radius,
+                self.border_thickness,
+                self.max_starvation_by_segment,
+                death_cause,
+                self.generation,
+                self.score,
+                self.ticks,
+                len(self.food_cells),
+                bytes.fromhex(self.digest)
+            ),
+            self.actions,
+            struct.pack(f"<{len(self.food_cells)}I", *self.food_cells)
+        ])
+
+    # возвращает эпизод и смещение после него
+    @classmethod
+    def load_from_buffer(cls, buffer: bytes | memoryview, offset: int = 0) -> tuple["Episode", int]:
+        (magic, version, tiles_in_radius, border_thickness, max_starvation_by_segment, death_cause, generation,
+         score, ticks, food_amount, digest) = EpisodeFormat.header.unpack_from(buffer, offset)
+        if magic != EpisodeFormat.magic:
+            raise ValueError("Buffer does not contain a snake episode")
+        if version > EpisodeFormat.version:
+            raise ValueError(f"Unsupported episode format version: {version}")
+        offset += EpisodeFormat.header.size
+
+        actions_length = -(-ticks // EpisodeFormat.actions_by_byte)
+        actions = bytes(buffer[offset:offset + actions_length])
+        offset += actions_length
+        food_cells = array.array('I', struct.unpack_from(f"<{food_amount}I", buffer, offset))
+        offset += struct.calcsize(f"<{food_amount}I")
+
+        if death_cause == EpisodeFormat.no_death_cause:
+            death_cause = None
+        episode = cls(
+            tiles_in_radius,
+            border_thickness,
+            max_starvation_by_segment,
+            actions,
+            ticks,
+            food_cells,
+            death_cause,
+            generation,
+            score,
+            digest.hex()
+        )
+        return episode, offset
+
+    @staticmethod
+    def dump_list_to_bytes(episodes: list["Episode"]) -> bytes:
+        return b"".join([EpisodeFormat.counter.pack(len(episodes)), *(episode.dump_to_bytes() for episode in episodes)])
+
+    @classmethod
+    def load_list_from_file(cls, path: str | Path) -> list["Episode"]:
+        with open(path, "rb") as file:
+            buffer = file.read()
+        (episodes_amount,) = EpisodeFormat.counter.unpack_from(buffer, 0)
+        offset = EpisodeFormat.counter.size
+        episodes = []
+        for _ in range(episodes_amount):
+            episode, offset = cls.load_from_buffer(buffer, offset)
+            episodes.append(episode)
+        return episodes
+
+
+# еда появляется в записанных клетках, а не случайно
+class ReplayMap(Map):
+    def __init__(self, geometry: MapGeometry, food_placements: array.array) -> None:
+        super().__init__(geometry, None)
+        self.food_placements = food_placements
+        # сколько еды уже размещено
+        self.food_index = 0
+
+    def place_food(self) -> None:
+        cell = self.food_placements[self.food_index]
+        self.food_index += 1
+        self.food[cell] = True
+        self.food_cells.add(cell)
+
+
+# змея поворачивает по записанным ходам, мозг не нужен
+class ReplaySnake(Snake):
+    def __init__(self, world_map: ReplayMap, episode: Episode) -> None:
+        # noinspection PyTypeChecker
+        super().__init__(None, world_map)
+        self.episode = episode
+        self.max_starvation_by_segment = self.episode.max_starvation_by_segment
+
+    # датчики не измеряются, секторы нужны только для отображения
+    def choose_direction(self) -> None:
+        self.update_available_directions()
+        self.sensored_sectors = [self.world_map.get_sector(self.body.head, direction)
+                                 for direction in self.available_directions]
+        self._sensored_tiles = None
+        self.turn()
+
+    # возраст змеи - количество уже сделанных ходов
+    def turn(self) -> None:
+        all_directions_amount = self.world_map.all_directions_amount
+        direction_change = self.episode.get_action(self.age) - self.world_map.directions_amount // 2
+        self.direction = (self.direction + direction_change + all_directions_amount) % all_directions_amount
+
+
+# воспроизводит эпизод и переходит к любому ходу: состояние восстанавливается из ближайшего предыдущего
+# ключевого кадра, поэтому переход стоит не больше keyframe_interval ходов
+class EpisodePlayer:
+    keyframe_interval = 64
+
+    def __init__(self, episode: Episode) -> None:
+        self.episode = episode
+        geometry = MapGeometry.get(self.episode.tiles_in_radius, self.episode.border_thickness)
+        self.world_map = ReplayMap(geometry, self.episode.food_cells)
+        self.snake = ReplaySnake(self.world_map, self.episode)
+        self.arena = Arena(self.snake)
+        self.tick = 0
+        self.keyframes: list[Keyframe] = []
+        self.prepare_keyframes()
+
+    @property
+    def finished(self) -> bool:
+        return self.tick >= self.episode.ticks
+
+    # один проход по всему эпизоду
+    def prepare_keyframes(self) -> None:
+        while True:
+            if self.tick % self.keyframe_interval == 0:
+                self.keyframes.append(self.get_keyframe())
+            if self.finished:
+                break
+            self.step()
+        self.restore(self.keyframes[0])
+
+    def get_keyframe(self) -> Keyframe:
+        snake = self.snake
+        return (
+            self.tick,
+            snake.body.get_cells(),
+            snake.direction,
+            snake.starvation,
+            snake.alive,
+            snake.death_cause,
+            tuple(self.world_map.food_cells),
+            self.world_map.food_index
+        )
+
+    def restore(self, keyframe: Keyframe) -> None:
+        tick, cells, direction, starvation, alive, death_cause, food_cells, food_index = keyframe
+        world_map = self.world_map
+        world_map.snake[:] = bytes(len(world_map.snake))
+        world_map.food[:] = bytes(len(world_map.food))
+        world_map.free_cells = world_map.geometry.free_cells.copy()
+        for cell in cells:
+            world_map.occupy(cell)
+        world_map.food_cells = set(food_cells)
+        for cell in food_cells:
+            world_map.food[cell] = True
+        world_map.food_index = food_index
+
+        snake = self.snake
+        snake.body.head_position = 0
+        snake.body.length = len(cells)
+        snake.body.cells[:len(cells)] = cells
+        snake.direction = direction
+        snake.starvation = starvation
+        snake.alive = alive
+        snake.death_cause = death_cause
+        snake.age = tick
+        snake.sensored_sectors = []
+        snake._sensored_tiles = None
+        self.tick = tick
+
+    # досрочно завершенная змея в записи еще жива после последнего хода, поэтому причина смерти берется из эпизода
+    def step(self) -> None:
+        if not self.finished:
+            self.arena.perform()
+            self.tick += 1
+            if self.finished:
+                self.snake.alive = False
+                self.snake.death_cause = self.episode.death_cause
+
+    def seek(self, tick: int) -> None:
+        tick = min(max(tick, 0), self.episode.ticks)
+        if tick < self.tick or tick - self.tick > self.keyframe_interval:
+            self.restore(self.keyframes[tick // self.keyframe_interval])
+        while self.tick < tick:
+            self.step()
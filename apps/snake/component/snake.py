@@ -1,5 +1,7 @@
+import array
+
 from apps.snake.component.brain import Brain
-from apps.snake.component.map import Map
+from apps.snake.component.map import Map, Sector
 from apps.snake.service.color import Color
 
 
@@ -7,24 +9,54 @@ class DeathCause:
     STARVATION = 0
     SEGMENT = 1
     BORDER = 2
-
-
-class Segment:
-    color = Color.SNAKE_ALIVE
-
-    def __init__(self, world_map: Map, x: int, y: int) -> None:
-        self.map = world_map
-        self.x = x
-        self.y = y
-
-    def move_to(self, x: int, y: int) -> tuple[int, int]:
-        self.map.snake[self.x][self.y] = None
-        previous_x = self.x
-        previous_y = self.y
-        self.x = x
-        self.y = y
-        self.map.snake[self.x][self.y] = self
-        return previous_x, previous_y
+    # змея повторила состояние, не поев, и дальше ходила бы по кругу до смерти от голода
+    CYCLE = 3
+    # змея остановлена, так как уже не может попасть в число лучших
+    STOPPED = 4
+
+
+# тело змеи - кольцевой буфер клеток фиксированной емкости
+# голова сдвигается к началу буфера, поэтому клетки от головы к хвосту идут по возрастанию индексов
+class Body:
+    __slots__ = ("cells", "capacity", "head_position", "length")
+
+    def __init__(self, capacity: int, cell: int) -> None:
+        self.capacity = capacity
+        self.cells = array.array('i', [0]) * self.capacity
+        self.head_position = 0
+        self.length = 1
+        self.cells[self.head_position] = cell
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def head(self) -> int:
+        return self.cells[self.head_position]
+
+    @property
+    def tail(self) -> int:
+        return self.cells[(self.head_position + self.length - 1) % self.capacity]
+
+    # клетки от головы к хвосту
+    def get_cells(self) -> array.array:
+        end = self.head_position + self.length
+        if end <= self.capacity:
+            cells = self.cells[self.head_position:end]
+        else:
+            cells = self.cells[self.head_position:] + self.cells[:end - self.capacity]
+        return cells
+
+    # при росте хвост остается на месте
+    def move(self, cell: int, grow: bool) -> int | None:
+        if grow:
+            self.length += 1
+            tail = None
+        else:
+            tail = self.tail
+        self.head_position = (self.head_position - 1) % self.capacity
+        self.cells[self.head_position] = cell
+        return tail
 
 
 class Snake:
@@ -32,60 +64,97 @@ class Snake:
         True: Color.SNAKE_ALIVE,
         False: Color.SNAKE_DEAD
     }
+    max_starvation_by_segment = 15
 
-    def __init__(self, brain: Brain, world_map: Map) -> None:
+    # detect_cycles - завершать змею, как только она повторит состояние, не поев
+    # работает только для мозгов без обратной связи, у остальных состояние не определяется картой
+    # record - записывать ходы змеи и размещения еды, чтобы эпизод можно было воспроизвести без мозга
+    def __init__(self, brain: Brain, world_map: Map, detect_cycles: bool = False, record: bool = False) -> None:
         self.brain = brain
         self.world_map = world_map
-        self.segments: list[Segment] = []
-        self.add_segment(self.world_map.side_length - 1, self.world_map.side_length - 1)
-        self.head = self.segments[0]
+        self.detect_cycles = detect_cycles and self.brain.stateless
+        # хэш тела без головы: xor ключей сегментов со связями к голове
+        self.body_hash = 0
+        # состояния после последней еды
+        self.visited_states: set[int] = set()
+        # ходы, которые змея прожила бы, если бы ее не завершили досрочно
+        self.skipped_ticks = 0
+        # змея не может быть длиннее, чем клеток на поверхности
+        self.body = Body(len(self.world_map.geometry.free_cells), self.world_map.geometry.center_cell)
+        self.world_map.occupy(self.body.head)
+        # поворот на каждом ходу: изменение направления, сдвинутое к нулю, None - ходы не записываются
+        self.actions: bytearray | None = None
+        if record:
+            self.actions = bytearray()
+            self.world_map.food_log = array.array('I')
 
         self.age = 0
         self.starvation = 0
-        self.max_starvation_by_segment = 15
         self.alive = True
         self.direction = 0
         self.death_cause = None
         self.available_directions: list[int] | None = None
-        self.sensored_tiles: set[tuple[int, int]] = set()
-
-    def add_segment(self, x: int, y: int) -> None:
-        segment = Segment(self.world_map, x, y)
-        self.segments.append(segment)
-        self.world_map.snake[x][y] = segment
-
-    def move(self, offset_x: int, offset_y: int) -> None:
-        x = self.segments[0].x + offset_x
-        y = self.segments[0].y + offset_y
-        for segment in self.segments:
-            x, y = segment.move_to(x, y)
+        self.sensored_sectors: list[Sector] = []
+        self._sensored_tiles: set[int] | None = None
+
+    # клетки под датчиками нужны только для отображения, поэтому собираются по запросу
+    @property
+    def sensored_tiles(self) -> set[int]:
+        if self._sensored_tiles is None:
+            self._sensored_tiles = set()
+            for sector in self.sensored_sectors:
+                self._sensored_tiles.update(sector.cells)
+        return self._sensored_tiles
+
+    # освобождается только клетка хвоста и занимается только клетка головы
+    def move(self, cell_offset: int, grow: bool) -> None:
+        previous_head = self.body.head
+        tail = self.body.move(previous_head + cell_offset, grow)
+        if tail is not None:
+            self.world_map.release(tail)
+        self.world_map.occupy(self.body.head)
+
+        if self.detect_cycles:
+            geometry = self.world_map.geometry
+            self.body_hash ^= geometry.link_keys[previous_head][self.direction]
+            if tail is not None:
+                self.body_hash ^= geometry.link_keys[tail][geometry.offset_directions[self.body.tail - tail]]
+
+    def get_state_hash(self) -> int:
+        geometry = self.world_map.geometry
+        state_hash = self.body_hash ^ geometry.head_keys[self.body.head] ^ geometry.direction_keys[self.direction]
+        for cell in self.world_map.food_cells:
+            state_hash ^= geometry.food_keys[cell]
+        return state_hash
+
+    # повторившееся без еды состояние повторится и дальше, поэтому змея доживает до смерти от голода сразу
+    def check_cycle(self) -> None:
+        if self.starvation == 0:
+            self.visited_states.clear()
+        else:
+            state_hash = self.get_state_hash()
+            if state_hash in self.visited_states:
+                self.skipped_ticks = self.get_remaining_ticks()
+                self.age += self.skipped_ticks
+                self.alive = False
+                self.death_cause = DeathCause.CYCLE
+            else:
+                self.visited_states.add(state_hash)
 
     def get_inputs(self) -> list[float]:
-        self.sensored_tiles = set()
-        borders = []
-        segments = []
-        food = []
-        sensors = (
-            (borders, self.world_map.borders),
-            (segments, self.world_map.snake),
-            (food, self.world_map.food)
-        )
-
-        for direction in self.available_directions:
-            sector = self.world_map.get_sector(self.head.x, self.head.y, direction)
-            self.sensored_tiles.update(sector)
-            for sensor, sensor_map in sensors:
-                sensor_value = 0
-                for x, y in sector:
-                    if sensor_map[x][y]:
-                        distance = (((self.head.x - x)**2 + (self.head.y - y)**2)**(1 / 2)
-                                    / self.world_map.direction_distance_correction[direction])
-                        sensor_value += 1 / distance
-                sensor.append(sensor_value)
+        self.sensored_sectors = [self.world_map.get_sector(self.body.head, direction)
+                                 for direction in self.available_directions]
+        self._sensored_tiles = None
+        borders = [sector.border_value for sector in self.sensored_sectors]
+        # занятых клеток обычно намного меньше, чем клеток в секторе, поэтому перебираются они
+        segment_cells = self.body.get_cells()
+        segments = [sector.measure_cells(segment_cells) if len(segment_cells) < len(sector.cells)
+                    else sector.measure(self.world_map.snake_values) for sector in self.sensored_sectors]
+        food = [sector.measure_cells(self.world_map.food_cells) for sector in self.sensored_sectors]
 
         return [*borders, *segments, *food]
 
-    def choose_direction(self) -> None:
+    def update_available_directions(self) -> None:
         directions_amount = self.world_map.directions_amount
         all_directions_amount = self.world_map.all_directions_amount
 
@@ -93,36 +162,47 @@ class Snake:
         offsets = range(start_direction_offset, directions_amount + start_direction_offset, 1)
         self.available_directions = [(self.direction + x + all_directions_amount) % all_directions_amount
                                      for x in offsets]
-        self.brain.process(self.get_inputs())
 
+    def turn(self) -> None:
+        all_directions_amount = self.world_map.all_directions_amount
         direction_change = self.brain.output + all_directions_amount
         self.direction = (self.direction + direction_change) % all_directions_amount
+        if self.actions is not None:
+            self.actions.append(self.brain.output + self.world_map.directions_amount // 2)
+
+    def choose_direction(self) -> None:
+        self.update_available_directions()
+        self.brain.process(self.get_inputs())
+        self.turn()
 
     def eat(self) -> None:
-        if self.world_map.food[self.head.x][self.head.y]:
+        if self.world_map.food[self.body.head]:
             self.starvation = 0
-            self.world_map.food[self.head.x][self.head.y] = False
+            self.world_map.remove_food(self.body.head)
         else:
             self.starvation += 1
 
     def perform(self) -> None:
         self.choose_direction()
-        move_x, move_y = self.world_map.offsets[self.direction]
+        self.advance()
 
-        border_collision = self.world_map.borders[self.head.x + move_x][self.head.y + move_y]
-        segment_collision = self.world_map.snake[self.head.x + move_x][self.head.y + move_y]
-        starvation_death = self.starvation >= (self.max_starvation_by_segment * len(self.segments) - 1)
+    # движение в уже выбранном направлении
+    def advance(self) -> None:
+        cell_offset = self.world_map.cell_offsets[self.direction]
+        next_cell = self.body.head + cell_offset
+
+        border_collision = self.world_map.borders[next_cell]
+        segment_collision = self.world_map.snake[next_cell]
+        starvation_death = self.starvation >= (self.max_starvation_by_segment * len(self.body) - 1)
 
         self.alive = not (border_collision or segment_collision or starvation_death)
         if self.alive:
-            tail_x = self.segments[-1].x
-            tail_y = self.segments[-1].y
-            self.move(move_x, move_y)
+            # змея растет, если съест еду в следующей клетке
+            self.move(cell_offset, bool(self.world_map.food[next_cell]))
             self.eat()
-            if self.starvation == 0:
-                self.add_segment(tail_x, tail_y)
+            if self.detect_cycles:
+                self.check_cycle()
         else:
-            Segment.color = Color.SNAKE_DEAD
             if border_collision:
                 self.death_cause = DeathCause.BORDER
             elif segment_collision:
@@ -132,7 +212,28 @@ class Snake:
 
         self.age += 1
 
-    def get_score(self) -> float:
-        length = len(self.segments)
-        score = length + self.age * 2 / self.max_starvation_by_segment / length / (1 + length)
+    def get_score(self, age: int | None = None) -> float:
+        if age is None:
+            age = self.age
+        length = len(self.body)
+        score = length + age * 2 / self.max_starvation_by_segment / length / (1 + length)
         return score
+
+    # ходы до смерти от голода, если змея больше не поест, включая ход, на котором она погибнет
+    def get_remaining_ticks(self) -> int:
+        return max(0, self.max_starvation_by_segment * len(self.body) - 1 - self.starvation) + 1
+
+    # до еды можно дойти раньше, чем змея умрет от голода, препятствия не учитываются
+    def can_reach_food(self) -> bool:
+        remaining_moves = self.get_remaining_ticks() - 1
+        return any(self.world_map.geometry.get_distance(self.body.head, cell) <= remaining_moves
+                   for cell in self.world_map.food_cells)
+
+    # наибольший счет, которого змея может достичь, если еда недостижима
+    def get_starvation_score(self) -> float:
+        return self.get_score(self.age + self.get_remaining_ticks())
+
+    def stop(self) -> None:
+        self.skipped_ticks = self.get_remaining_ticks()
+        self.alive = False
+        self.death_cause = DeathCause.STOPPED
@@ -0,0 +1,193 @@
+import csv
+import itertools
+import multiprocessing
+import random
+import time
+from pathlib import Path
+from typing import Iterator
+
+from apps.snake.component.activation import Sigmoid
+from apps.snake.component.brain import Brain, Neuron
+from apps.snake.component.map import Map, MapGeometry
+from apps.snake.component.snake import Snake
+from apps.snake.component.trainer import Trainer
+
+
+# параметр -> (класс, атрибут), значение задается в процессе задачи до создания мозгов и змей
+# VectorEnvironment берет голод на сегмент у Snake, поэтому параметр действует и на нее
+class_parameters = {
+    "max_mutation_spread": (Neuron, "max_mutation_spread"),
+    "steepness": (Sigmoid, "steepness"),
+    "max_starvation_by_segment": (Snake, "max_starvation_by_segment")
+}
+# параметры тренировки и их значения по умолчанию, как у ползунков ActionTab
+training_parameters = {
+    "generation_size": 10,
+    "reference_brains": 10
+}
+
+# значения параметра для перебора сетки или для случайного поиска
+ParameterValues = list[float]
+# границы значений параметра для случайного поиска: целые границы - целые значения
+ParameterRange = tuple[float, float]
+# (номер задачи, значения параметров, зерно генератора random)
+SweepJob = tuple[int, dict[str, float], int]
+# (поколение, лучший счет поколения, время с начала задачи)
+ProgressPoint = tuple[int, float, float]
+# (номер задачи, значения параметров, зерно, прогресс)
+SweepResult = tuple[int, dict[str, float], int, list[ProgressPoint]]
+
+# настройки процесса-исполнителя, задаются при его запуске
+worker_map: Map | None = None
+worker_brain: bytes | None = None
+worker_generations_amount = 0
+worker_target_score: float | None = None
+
+
+def prepare_worker(
+        tiles_in_radius: int,
+        border_thickness: int,
+        food_seed: int | None,
+        brain: bytes,
+        generations_amount: int,
+        target_score: float | None
+) -> None:
+    global worker_map, worker_brain, worker_generations_amount, worker_target_score
+    worker_map = Map(MapGeometry.get(tiles_in_radius, border_thickness), food_seed = food_seed)
+    worker_brain = brain
+    worker_generations_amount = generations_amount
+    worker_target_score = target_score
+
+
+# задача выполняется в отдельном процессе, поэтому измененные атрибуты классов не влияют на другие задачи
+def run_job(job: SweepJob) -> SweepResult:
+    index, parameters, seed = job
+    for name, value in parameters.items():
+        if name in class_parameters:
+            parameter_class, attribute = class_parameters[name]
+            setattr(parameter_class, attribute, value)
+    random.seed(seed)
+
+    # подготовка первого поколения тоже входит во время тренировки
+    start = time.perf_counter()
+    trainer = Trainer(worker_map, None)
+    trainer.checkpoint_interval = 0
+    trainer.record_episodes = False
+    trainer.performance_log = None
+    trainer.start(
+        [Brain.load_from_buffer(worker_brain)],
+        worker_generations_amount,
+        int(parameters.get("generation_size", training_parameters["generation_size"])),
+        int(parameters.get("reference_brains", training_parameters["reference_brains"]))
+    )
+
+    progress = []
+    while trainer.training:
+        trainer.train_generation()
+        best_score = trainer.reference_brains[0].score
+        progress.append((trainer.reference_brains[0].generation, best_score, time.perf_counter() - start))
+        # дальше тренировать незачем: время и поколения до цели уже известны
+        if worker_target_score is not None and best_score >= worker_target_score:
+            break
+    return index, parameters, seed, progress
+
+
+def get_grid(values: dict[str, ParameterValues]) -> list[dict[str, float]]:
+    return [dict(zip(values, combination)) for combination in itertools.product(*values.values())]
+
+
+def get_random_samples(
+        values: dict[str, ParameterValues | ParameterRange],
+        samples_amount: int
+) -> list[dict[str, float]]:
+    samples = []
+    for _ in range(samples_amount):
+        sample = {}
+        for name, parameter_values in values.items():
+            if isinstance(parameter_values, list):
+                sample[name] = random.choice(parameter_values)
+            elif all(isinstance(x, int) for x in parameter_values):
+                sample[name] = random.randint(*parameter_values)
+            else:
+                sample[name] = random.uniform(*parameter_values)
+        samples.append(sample)
+    return samples
+
+
+# запускает безоконные тренировки с разными параметрами в пуле процессов
+# прогресс каждой задачи - лучший счет по поколениям и по времени - дописывается в общую таблицу
+class SweepRunner:
+    parameters = (*class_parameters, *training_parameters)
+
+    def __init__(
+            self,
+            results_path: str | Path,
+            generations_amount: int,
+            target_score: float | None = None,
+            processes: int | None = None
+    ) -> None:
+        self.results_path = Path(results_path)
+        self.generations_amount = generations_amount
+        self.target_score = target_score
+        self.processes = processes
+        # незаданные параметры остаются такими, как в родительском процессе
+        self.defaults = {
+            **{name: getattr(*class_parameter) for name, class_parameter in class_parameters.items()},
+            **training_parameters
+        }
+
+    # repeats - сколько раз с разными зернами прогоняется каждый набор параметров
+    def run(
+            self,
+            parameter_sets: list[dict[str, float]],
+            reference_map: Map,
+            brain: Brain,
+            repeats: int = 1
+    ) -> Iterator[SweepResult]:
+        for parameters in parameter_sets:
+            for name in parameters:
+                if name not in self.parameters:
+                    raise ValueError(f"Unknown sweep parameter: {name}")
+
+        jobs = [(index, parameters, random.getrandbits(32))
+                for index, parameters in enumerate(x for x in parameter_sets for _ in range(repeats))]
+        # spawn не копирует состояние окна и графического контекста родительского процесса,
+        # а процесс на каждую задачу не дает атрибутам классов перейти из одной задачи в другую
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(
+            self.processes,
+            prepare_worker,
+            (
+                reference_map.geometry.tiles_in_radius,
+                reference_map.geometry.border_thickness,
+                reference_map.food_seed,
+                brain.dump_to_bytes(),
+                self.generations_amount,
+                self.target_score
+            ),
+            maxtasksperchild = 1
+        ) as pool:
+            for result in pool.imap_unordered(run_job, jobs):
+                self.append(result)
+                yield result
+
+    # одна строка на поколение задачи, все задачи в одной таблице
+    def append(self, result: SweepResult) -> None:
+        index, parameters, seed, progress = result
+        fieldnames = ["job", *self.parameters, "seed", "generation", "best_score", "time", "target_reached"]
+        self.results_path.parent.mkdir(parents = True, exist_ok = True)
+        write_header = not self.results_path.exists() or self.results_path.stat().st_size == 0
+        with open(self.results_path, 'a', newline = "") as file:
+            writer = csv.DictWriter(file, fieldnames = fieldnames)
+            if write_header:
+                writer.writeheader()
+            for generation, best_score, elapsed_time in progress:
+                writer.writerow({
+                    "job": index,
+                    **{name: parameters.get(name, self.defaults[name]) for name in self.parameters},
+                    "seed": seed,
+                    "generation": generation,
+                    "best_score": best_score,
+                    "time": elapsed_time,
+                    "target_reached": self.target_score is not None and best_score >= self.target_score
+                })
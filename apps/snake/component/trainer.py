@@ -0,0 +1,546 @@
+import collections
+import datetime
+import heapq
+import itertools
+import json
+import random
+import struct
+import time
+from pathlib import Path
+
+from apps.snake.component.arena import Arena
+from apps.snake.component.brain import Brain
+from apps.snake.component.evaluator import PoolEvaluator
+from apps.snake.component.map import Map
+from apps.snake.component.population import Population
+from apps.snake.component.replay import Episode
+from apps.snake.component.snake import DeathCause, Snake
+from apps.snake.service.library import BrainLibrary
+from apps.snake.service.performance import GenerationPerformance, PerformanceLog
+from apps.snake.settings import Settings
+from core.service.writer import BackgroundWriter
+
+
+# (счет, возраст, причина смерти)
+FitnessResult = tuple[float, int, int | None]
+
+
+# результаты оценки мозгов по отпечатку содержимого и зерну еды: при тех же мозге и еде змея проживет так же
+class FitnessCache:
+    max_size = 10000
+
+    def __init__(self) -> None:
+        self.results: collections.OrderedDict[tuple[str, int], FitnessResult] = collections.OrderedDict()
+        self.hits = 0
+        self.lookups = 0
+
+    @property
+    def hit_rate(self) -> float:
+        if self.lookups > 0:
+            hit_rate = self.hits / self.lookups
+        else:
+            hit_rate = 0.0
+        return hit_rate
+
+    def get(self, digest: str, seed: int) -> FitnessResult | None:
+        self.lookups += 1
+        result = self.results.get((digest, seed))
+        if result is not None:
+            self.hits += 1
+            self.results.move_to_end((digest, seed))
+        return result
+
+    def put(self, digest: str, seed: int, result: FitnessResult) -> None:
+        self.results[(digest, seed)] = result
+        self.results.move_to_end((digest, seed))
+        if len(self.results) > self.max_size:
+            self.results.popitem(last = False)
+
+
+# двоичный формат контрольной точки тренировки (little-endian):
+# заголовок, метаданные в json, состояние генератора random, эталонные и лучшие мозги в двоичном формате
+class CheckpointFormat:
+    magic = b"SNKT"
+    version = 1
+    # магия, версия, версия генератора random, длина метаданных, количество слов состояния генератора
+    header = struct.Struct("<4sHHII")
+    counter = struct.Struct("<I")
+
+
+# цикл поколений без интерфейса: создание арен, прогон змей, отбор, мутация и сохранение мозгов
+class Trainer:
+    # все арены поколения двигаются одновременно, а мозги обрабатываются одним вызовом за тик
+    # еда при этом раскладывается в другом порядке, чем при последовательной обработке,
+    # поэтому с одним зерном random результаты режимов различаются
+    population_inference = True
+    best_brains_amount = 3
+    save_best_brains = False
+    # больше 1 - арены поколения оцениваются в пуле процессов
+    processes = 1
+    # змеи, зациклившиеся без еды, завершаются сразу со счетом, который получили бы к смерти от голода
+    cycle_detection = True
+    # змеи, которые уже не могут попасть в число лучших, завершаются досрочно
+    early_stopping = False
+    settings = Settings()
+    # через сколько поколений сохраняется контрольная точка, 0 - не сохраняется
+    checkpoint_interval = 10
+    # змеи записывают ходы, а лучший эпизод поколения сохраняется, чтобы его можно было посмотреть без прогона
+    # при оценке в пуле ходы не записываются
+    record_episodes = True
+
+    # если у эталонной карты задано зерно еды, все змеи получают одинаковую еду,
+    # а результаты мозгов, уже оцененных с этим зерном, берутся из кэша
+    # brain_library - None, если результат забирается без сохранения, например, с острова
+    # writer - контрольные точки записываются в отдельном потоке и не задерживают тренировку
+    def __init__(
+            self,
+            reference_map: Map,
+            brain_library: BrainLibrary | None,
+            writer: BackgroundWriter | None = None
+    ) -> None:
+        self.reference_map = reference_map
+        self.brain_library = brain_library
+        self.writer = writer
+        self.checkpoint_path = Path(self.settings.CHECKPOINT_PATH)
+        self.episodes_path = Path(self.settings.EPISODES_PATH)
+        self.fitness_cache = FitnessCache()
+
+        self.training = False
+        self.reference_brains: list[Brain] | None = None
+        self.reference_brains_amount: int | None = None
+        self.start_generation: int | None = None
+        self.max_generation: int | None = None
+        self.generation_size_by_brain: int | None = None
+
+        # все мозги поколения, в том числе те, чьи результаты взяты из кэша и для которых арены не создавались
+        self.generation_brains: list[Brain] | None = None
+        self.cached_death_causes: list[int | None] = []
+        self.training_arenas: list[Arena] | None = None
+        self.training_arena_index = 0
+        self.population: Population | None = None
+        self.alive_arena_indices: list[int] | None = None
+        self.evaluator: PoolEvaluator | None = None
+
+        self.best_brains: list[Brain] = []
+        # лучшие эпизоды поколений по порядку
+        self.episodes: list[Episode] = []
+        # причина смерти -> количество змей прошлого поколения
+        self.death_causes: collections.Counter[int | None] = collections.Counter()
+        # наименьшие из лучших счетов завершенных змей поколения, куча
+        self.elite_scores: list[float] = []
+        # ходы, пропущенные за прошлое поколение и за всю тренировку благодаря досрочному завершению змей
+        self.saved_ticks = 0
+        self.cached_brains_amount = 0
+        self.total_saved_ticks = 0
+        # ходы змей, действительно выполненные с создания тренера, по ним считается скорость тренировки
+        self.performed_cycles = 0
+        # счетчики текущего поколения дописываются в журнал производительности, None - не записываются
+        self.performance: GenerationPerformance | None = None
+        self.performance_log: PerformanceLog | None = PerformanceLog(self.settings.PERFORMANCE_LOG_PATH)
+        self.generation_start_cycles = 0
+        self.training_start_time: datetime.datetime | None = None
+        self.last_generation_trained_time: datetime.datetime | None = None
+
+    def start(
+            self,
+            reference_brains: list[Brain],
+            generations_amount: int,
+            generation_size_by_brain: int,
+            reference_brains_amount: int
+    ) -> None:
+        self.reference_brains = reference_brains
+        self.start_generation = self.reference_brains[0].generation
+        self.max_generation = self.start_generation + generations_amount
+        self.generation_size_by_brain = generation_size_by_brain
+        self.reference_brains_amount = reference_brains_amount
+        self.best_brains = []
+        self.episodes = []
+        self.saved_ticks = 0
+        self.cached_brains_amount = 0
+        self.total_saved_ticks = 0
+        self.training_start_time = None
+        self.last_generation_trained_time = None
+        if self.performance_log is not None:
+            self.performance_log.start_run()
+        if self.processes > 1 and self.evaluator is None:
+            self.evaluator = PoolEvaluator(self.processes, self.reference_map, self.cycle_detection)
+        self.prepare_training_arenas()
+        self.training = True
+
+    def prepare_training_arenas(self) -> None:
+        self.performance = GenerationPerformance()
+        self.generation_start_cycles = self.performed_cycles
+        if self.training_start_time is None:
+            self.training_start_time = datetime.datetime.now()
+        else:
+            self.last_generation_trained_time = datetime.datetime.now()
+
+        self.elite_scores = []
+        self.generation_brains = []
+        self.cached_death_causes = []
+        self.training_arenas = []
+        record = self.record_episodes and self.evaluator is None
+        # мозги создаются по одному вместе с аренами, чтобы порядок обращений к генератору random не менялся
+        brains = itertools.chain(
+            (brain.mutate() for _ in range(self.generation_size_by_brain - 1) for brain in self.reference_brains),
+            (brain.clone() for brain in self.reference_brains)
+        )
+        for brain in brains:
+            self.generation_brains.append(brain)
+            if not self.apply_cached_fitness(brain):
+                snake = Snake(brain, self.reference_map.copy(), self.cycle_detection, record)
+                self.training_arenas.append(Arena(snake))
+        self.training_arena_index = 0
+        if self.evaluator is not None:
+            self.evaluator.submit([(index, arena.snake.brain.dump_to_bytes(), self.get_food_seed())
+                                   for index, arena in enumerate(self.training_arenas)])
+        elif self.population_inference:
+            self.population = Population([arena.snake.brain for arena in self.training_arenas])
+            self.alive_arena_indices = list(range(len(self.training_arenas)))
+        self.performance.add("preparation", time.perf_counter() - self.performance.start_time)
+
+    def get_food_seed(self) -> int:
+        if self.reference_map.food_seed is not None:
+            seed = self.reference_map.food_seed
+        else:
+            seed = random.getrandbits(32)
+        return seed
+
+    # возвращает True, если результат мозга известен и арена для него не нужна
+    def apply_cached_fitness(self, brain: Brain) -> bool:
+        if self.reference_map.food_seed is None:
+            return False
+
+        result = self.fitness_cache.get(brain.digest, self.reference_map.food_seed)
+        if result is not None:
+            brain.score, brain.age, death_cause = result
+            self.cached_death_causes.append(death_cause)
+            if self.early_stopping:
+                self.add_elite_score(brain.score)
+        return result is not None
+
+    # арена, за которой можно следить во время тренировки
+    @property
+    def current_arena(self) -> Arena | None:
+        if self.evaluator is not None:
+            arena = None
+        elif self.population_inference and len(self.alive_arena_indices) > 0:
+            arena = self.training_arenas[self.alive_arena_indices[0]]
+        elif not self.population_inference and self.training_arena_index < len(self.training_arenas):
+            arena = self.training_arenas[self.training_arena_index]
+        else:
+            arena = None
+        return arena
+
+    # возвращает True, если все змеи поколения погибли
+    def train(self, cycles: int) -> bool:
+        if self.evaluator is not None:
+            generation_trained = self.train_in_pool()
+        elif self.population_inference:
+            generation_trained = self.train_population(cycles)
+        else:
+            generation_trained = self.train_sequentially(cycles)
+        return generation_trained
+
+    # один цикл - один ход одной змеи
+    def train_population(self, cycles: int) -> bool:
+        while cycles > 0 and len(self.alive_arena_indices) > 0:
+            arenas = [self.training_arenas[index] for index in self.alive_arena_indices]
+            start = time.perf_counter()
+            inputs = []
+            for arena in arenas:
+                arena.snake.update_available_directions()
+                inputs.append(arena.snake.get_inputs())
+            sensed = time.perf_counter()
+            self.population.process(self.alive_arena_indices, inputs)
+            processed = time.perf_counter()
+            for arena in arenas:
+                arena.snake.turn()
+                arena.snake.advance()
+            moved = time.perf_counter()
+            # еда раскладывается после движения всех змей, но в том же порядке, что и в Arena.advance,
+            # поэтому обращения к генератору random не меняются
+            for arena in arenas:
+                if arena.snake.starvation == 0:
+                    arena.world_map.place_food()
+            fed = time.perf_counter()
+            self.add_phase_times(start, sensed, processed, moved, fed)
+            if self.early_stopping:
+                for arena in arenas:
+                    self.check_elite(arena)
+                self.performance.add("selection", time.perf_counter() - fed)
+            cycles -= len(arenas)
+            self.performed_cycles += len(arenas)
+
+            self.alive_arena_indices = [index for index in self.alive_arena_indices
+                                        if self.training_arenas[index].snake.alive]
+            self.training_arena_index = len(self.training_arenas) - len(self.alive_arena_indices)
+        return len(self.alive_arena_indices) == 0
+
+    def train_sequentially(self, cycles: int) -> bool:
+        for _ in range(cycles):
+            if self.training_arena_index < len(self.training_arenas):
+                arena = self.training_arenas[self.training_arena_index]
+                if arena.snake.alive:
+                    self.perform(arena)
+                    self.performed_cycles += 1
+                    if self.early_stopping:
+                        self.check_elite(arena)
+                else:
+                    self.training_arena_index += 1
+            else:
+                generation_trained = True
+                break
+        else:
+            generation_trained = False
+        return generation_trained
+
+    # Arena.perform по этапам, время которых учитывается в счетчиках поколения
+    def perform(self, arena: Arena) -> None:
+        snake = arena.snake
+        start = time.perf_counter()
+        snake.update_available_directions()
+        inputs = snake.get_inputs()
+        sensed = time.perf_counter()
+        snake.brain.process(inputs)
+        processed = time.perf_counter()
+        snake.turn()
+        snake.advance()
+        moved = time.perf_counter()
+        if snake.starvation == 0:
+            arena.world_map.place_food()
+        self.add_phase_times(start, sensed, processed, moved, time.perf_counter())
+
+    def add_phase_times(self, start: float, sensed: float, processed: float, moved: float, fed: float) -> None:
+        phase_times = self.performance.phase_times
+        phase_times["sensing"] += sensed - start
+        phase_times["inference"] += processed - sensed
+        phase_times["movement"] += moved - processed
+        phase_times["food"] += fed - moved
+
+    # сколько лучших змей важно для отбора
+    @property
+    def elite_amount(self) -> int:
+        elite_amount = self.reference_brains_amount
+        if self.save_best_brains:
+            elite_amount = max(elite_amount, self.best_brains_amount)
+        return elite_amount
+
+    def add_elite_score(self, score: float) -> None:
+        if len(self.elite_scores) < self.elite_amount:
+            heapq.heappush(self.elite_scores, score)
+        else:
+            heapq.heappushpop(self.elite_scores, score)
+
+    # счет погибшей змеи становится кандидатом в границу отбора, а живая змея останавливается,
+    # если еда для нее недостижима, а наибольший возможный счет без еды меньше границы
+    # граница точная, поэтому результат отбора совпадает с полным прогоном
+    def check_elite(self, arena: Arena) -> None:
+        snake = arena.snake
+        if not snake.alive:
+            self.add_elite_score(snake.get_score())
+        elif (len(self.elite_scores) == self.elite_amount and snake.get_starvation_score() < self.elite_scores[0]
+              and not snake.can_reach_food()):
+            snake.stop()
+
+    # в пуле циклы не считаются: забираются готовые результаты, а арены отмечаются погибшими
+    def train_in_pool(self) -> bool:
+        for index, score, age, death_cause, skipped_ticks in self.evaluator.collect():
+            snake = self.training_arenas[index].snake
+            snake.alive = False
+            snake.age = age
+            snake.death_cause = death_cause
+            snake.skipped_ticks = skipped_ticks
+            snake.brain.score = score
+            snake.brain.age = age
+            self.performed_cycles += age - skipped_ticks
+        self.training_arena_index = self.evaluator.results_amount
+        return self.evaluator.finished
+
+    # оценивает поколение, отбирает лучшие мозги и готовит следующее поколение или сохраняет результат
+    def finish_generation(self) -> None:
+        selection_start = time.perf_counter()
+        # при оценке в пуле счет уже получен от процессов
+        if self.evaluator is None:
+            for arena in self.training_arenas:
+                arena.snake.brain.score = arena.snake.get_score()
+                arena.snake.brain.age = arena.snake.age
+        self.death_causes = collections.Counter(arena.snake.death_cause for arena in self.training_arenas)
+        self.death_causes.update(self.cached_death_causes)
+        self.saved_ticks = sum(arena.snake.skipped_ticks for arena in self.training_arenas)
+        self.total_saved_ticks += self.saved_ticks
+        # сколько мозгов завершенного поколения оценено по кэшу, до подготовки следующего поколения
+        self.cached_brains_amount = len(self.generation_brains) - len(self.training_arenas)
+        # остановленные змеи не дожили до конца, поэтому их счет не кэшируется
+        if self.reference_map.food_seed is not None:
+            for arena in self.training_arenas:
+                snake = arena.snake
+                if snake.death_cause != DeathCause.STOPPED:
+                    self.fitness_cache.put(snake.brain.digest, self.reference_map.food_seed,
+                                           (snake.brain.score, snake.brain.age, snake.death_cause))
+        brains = sorted(self.generation_brains, key = lambda x: x.score, reverse = True)
+
+        if self.save_best_brains:
+            self.best_brains.extend(brains[:self.best_brains_amount])
+            self.best_brains.sort(key = lambda x: x.score, reverse = True)
+            self.best_brains = self.best_brains[:self.best_brains_amount]
+
+        self.reference_brains = brains[:self.reference_brains_amount]
+        for brain in self.reference_brains:
+            brain.generation += 1
+        # лучшая из прогнанных змей: мозги, оцененные по кэшу, в этом поколении не двигались
+        if len(self.training_arenas) > 0 and self.training_arenas[0].snake.actions is not None:
+            best_snake = max((arena.snake for arena in self.training_arenas), key = lambda x: x.brain.score)
+            self.episodes.append(Episode.from_snake(best_snake, self.reference_brains[0].generation))
+        self.performance.add("selection", time.perf_counter() - selection_start)
+        self.performance.finish(
+            self.reference_brains[0].generation,
+            self.performed_cycles - self.generation_start_cycles,
+            len(self.training_arenas)
+        )
+        if self.performance_log is not None:
+            self.performance_log.append(self.performance)
+
+        if self.reference_brains[0].generation < self.max_generation:
+            trained_generations = self.reference_brains[0].generation - self.start_generation
+            if self.checkpoint_interval > 0 and trained_generations % self.checkpoint_interval == 0:
+                self.save_checkpoint()
+            self.prepare_training_arenas()
+        else:
+            if self.brain_library is not None:
+                self.brain_library.save(self.result_brains)
+                self.save_episodes()
+            self.remove_checkpoint()
+            self.training = False
+            self.max_generation = None
+            self.close()
+
+    # мозги, которые сохраняются по окончании тренировки
+    @property
+    def result_brains(self) -> list[Brain]:
+        if self.save_best_brains:
+            brains = [*self.best_brains, *self.reference_brains]
+        else:
+            brains = self.reference_brains
+        return brains
+
+    # состояние между поколениями: после отбора и до мутации, которая первой обращается к генератору random
+    def dump_checkpoint(self) -> bytes:
+        random_version, random_state, gauss_next = random.getstate()
+        metadata = {
+            "start_generation": self.start_generation,
+            "max_generation": self.max_generation,
+            "generation_size_by_brain": self.generation_size_by_brain,
+            "reference_brains_amount": self.reference_brains_amount,
+            "total_saved_ticks": self.total_saved_ticks,
+            "training_time": (datetime.datetime.now() - self.training_start_time).total_seconds(),
+            "gauss_next": gauss_next
+        }
+        metadata = json.dumps(metadata).encode()
+
+        parts = [
+            CheckpointFormat.header.pack(
+                CheckpointFormat.magic,
+                CheckpointFormat.version,
+                random_version,
+                len(metadata),
+                len(random_state)
+            ),
+            metadata,
+            struct.pack(f"<{len(random_state)}I", *random_state)
+        ]
+        for brains in (self.reference_brains, self.best_brains):
+            parts.append(CheckpointFormat.counter.pack(len(brains)))
+            for brain in brains:
+                data = brain.dump_to_bytes()
+                parts.append(CheckpointFormat.counter.pack(len(data)))
+                parts.append(data)
+        return b"".join(parts)
+
+    @staticmethod
+    def load_checkpoint_brains(view: memoryview, offset: int) -> tuple[list[Brain], int]:
+        (brains_amount,) = CheckpointFormat.counter.unpack_from(view, offset)
+        offset += CheckpointFormat.counter.size
+        brains = []
+        for _ in range(brains_amount):
+            (length,) = CheckpointFormat.counter.unpack_from(view, offset)
+            offset += CheckpointFormat.counter.size
+            brains.append(Brain.load_from_buffer(view[offset:offset + length]))
+            offset += length
+        return brains, offset
+
+    def save_checkpoint(self) -> None:
+        data = self.dump_checkpoint()
+        if self.writer is None:
+            BackgroundWriter.write_atomically(self.checkpoint_path, data)
+        else:
+            self.writer.write(self.checkpoint_path, data)
+
+    # эпизоды сохраняются вместе с мозгами результата и заменяют эпизоды прошлой тренировки
+    def save_episodes(self) -> None:
+        if len(self.episodes) > 0:
+            data = Episode.dump_list_to_bytes(self.episodes)
+            if self.writer is None:
+                BackgroundWriter.write_atomically(self.episodes_path, data)
+            else:
+                self.writer.write(self.episodes_path, data)
+
+    def remove_checkpoint(self) -> None:
+        if self.writer is None:
+            self.checkpoint_path.unlink(missing_ok = True)
+        else:
+            self.writer.remove(self.checkpoint_path)
+
+    @property
+    def checkpoint_exists(self) -> bool:
+        return self.checkpoint_path.exists()
+
+    # продолжает тренировку с последней контрольной точки: уже пройденные поколения не оцениваются заново,
+    # а генератор random восстанавливается, поэтому тренировка идет так же, как шла бы без перерыва
+    def resume(self) -> None:
+        with open(self.checkpoint_path, "rb") as file:
+            view = memoryview(file.read())
+        (magic, version, random_version, metadata_length,
+         random_state_length) = CheckpointFormat.header.unpack_from(view, 0)
+        if magic != CheckpointFormat.magic:
+            raise ValueError("File does not contain a training checkpoint")
+        if version > CheckpointFormat.version:
+            raise ValueError(f"Unsupported checkpoint format version: {version}")
+        offset = CheckpointFormat.header.size
+
+        metadata = json.loads(str(view[offset:offset + metadata_length], "utf-8"))
+        offset += metadata_length
+        random_state = struct.unpack_from(f"<{random_state_length}I", view, offset)
+        offset += struct.calcsize(f"<{random_state_length}I")
+        self.reference_brains, offset = self.load_checkpoint_brains(view, offset)
+        self.best_brains, offset = self.load_checkpoint_brains(view, offset)
+        view.release()
+        self.episodes = []
+
+        self.start_generation = metadata["start_generation"]
+        self.max_generation = metadata["max_generation"]
+        self.generation_size_by_brain = metadata["generation_size_by_brain"]
+        self.reference_brains_amount = metadata["reference_brains_amount"]
+        self.saved_ticks = 0
+        self.cached_brains_amount = 0
+        self.total_saved_ticks = metadata["total_saved_ticks"]
+        self.training_start_time = datetime.datetime.now() - datetime.timedelta(seconds = metadata["training_time"])
+        self.last_generation_trained_time = None
+        random.setstate((random_version, random_state, metadata["gauss_next"]))
+        if self.performance_log is not None:
+            self.performance_log.start_run()
+        if self.processes > 1 and self.evaluator is None:
+            self.evaluator = PoolEvaluator(self.processes, self.reference_map, self.cycle_detection)
+        self.prepare_training_arenas()
+        self.training = True
+
+    def close(self) -> None:
+        if self.evaluator is not None:
+            self.evaluator.close()
+            self.evaluator = None
+
+    # прогоняет поколение целиком, без ограничения по времени
+    def train_generation(self, cycles: int = 10000) -> None:
+        while not self.train(cycles):
+            pass
+        self.finish_generation()
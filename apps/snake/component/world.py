@@ -6,7 +6,7 @@ import arcade
 from arcade import Sprite, SpriteList
 
 from core.texture import Texture
-from apps.snake.component.map import Map
+from apps.snake.component.map import Map, MapGeometry
 from apps.snake.service.color import Color
 from apps.snake.settings import Settings
 
@@ -32,6 +32,7 @@ class Tile(Sprite):
 
     map_x: int
     map_y: int
+    map_cell: int
     is_surface = False
     is_border = False
 
@@ -80,19 +81,20 @@ class Tile(Sprite):
         self.world.tile_borders.remove(self.border)
 
     def update_color(self) -> None:
-        arena = self.world.view.released_arena
-        show = (self.world.view.snake_released or self.world.view.show_training) and arena is not None
+        view = self.world.view
+        arena = view.released_arena
+        show = (view.snake_released or view.snake_replaying or view.show_training) and arena is not None
 
-        if show and arena.world_map.snake[self.map_x][self.map_y]:
+        if show and arena.world_map.snake[self.map_cell]:
             snake = arena.snake
             color = snake.colors[snake.alive]
-        elif show and arena.world_map.food[self.map_x][self.map_y]:
+        elif show and arena.world_map.food[self.map_cell]:
             color = Color.FOOD
         else:
             color = self.colors[self.enabled]
 
         if (self.world.view.show_sensored_tiles and self.world.view.released_arena is not None and
-                (self.map_x, self.map_y) in self.world.view.released_arena.snake.sensored_tiles):
+                self.map_cell in self.world.view.released_arena.snake.sensored_tiles):
             color = (x - 8 if index < 3 else x for index, x in enumerate(color))
 
         if color != self.color:
@@ -144,7 +146,11 @@ class World:
         self.tile_borders = arcade.shape_list.ShapeElementList()
         self.create()
 
-        self.reference_map = Map(self)
+        self.map_geometry = MapGeometry.get(self.tiles_in_radius, self.border_thickness)
+        for tile, cell in zip(self.all_tiles, self.map_geometry.tile_cells):
+            tile.map_cell = cell
+            tile.map_x, tile.map_y = self.map_geometry.get_position(cell)
+        self.reference_map = Map(self.map_geometry)
 
     # мир делится на шестиугольники
     # https://www.redblobgames.com/grids/hexagons/
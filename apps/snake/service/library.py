@@ -0,0 +1,163 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from apps.snake.component.brain import Brain
+from apps.snake.settings import Settings
+from core.service.writer import BackgroundWriter
+
+
+EntryDescription = dict[str, str | int | float | list[int]]
+
+
+# сведения о сохраненном мозге, по которым его можно показать и отсортировать, не загружая
+class LibraryEntry:
+    def __init__(
+            self,
+            digest: str,
+            file_name: str,
+            generation: int,
+            score: float,
+            name: str,
+            topology: list[int],
+            mtime: float
+    ) -> None:
+        self.digest = digest
+        self.file_name = file_name
+        self.generation = generation
+        self.score = score
+        self.name = name
+        self.topology = topology
+        self.mtime = mtime
+
+    @classmethod
+    def from_brain(cls, brain: Brain, file_name: str | None = None) -> "LibraryEntry":
+        if file_name is None:
+            file_name = brain.save_name
+        return cls(
+            brain.digest,
+            file_name,
+            brain.generation,
+            brain.score,
+            brain.name,
+            [len(layer) for layer in brain.layers],
+            time.time()
+        )
+
+    def dump(self) -> EntryDescription:
+        return dict(self.__dict__)
+
+    @classmethod
+    def load(cls, data: EntryDescription) -> "LibraryEntry":
+        return cls(**data)
+
+    @property
+    def pretty_score(self) -> float:
+        return round(self.score, 3)
+
+
+# хранилище мозгов: файлы называются по отпечатку содержимого, а сведения о них лежат в общем индексе
+class BrainLibrary:
+    settings = Settings()
+    index_name = "index.json"
+    index_version = 1
+
+    def __init__(self, path: str | Path | None = None, writer: BackgroundWriter | None = None) -> None:
+        if path is None:
+            path = self.settings.BRAINS_PATH
+        self.path = Path(path)
+        self.index_path = self.path / self.index_name
+        self.writer = writer
+        # отпечаток -> сведения о мозге
+        self.entries: dict[str, LibraryEntry] = {}
+        # файлы с уже известным содержимым, сохраненные до появления библиотеки
+        self.duplicates: set[str] = set()
+        self.read_index()
+        self.refresh()
+
+    def write(self, path: Path, data: bytes) -> None:
+        if self.writer is None:
+            BackgroundWriter.write_atomically(path, data)
+        else:
+            self.writer.write(path, data)
+
+    def write_index(self) -> None:
+        index = {
+            "version": self.index_version,
+            "brains": [entry.dump() for entry in self.entries.values()],
+            "duplicates": sorted(self.duplicates)
+        }
+        self.write(self.index_path, json.dumps(index, indent = 4).encode())
+
+    def read_index(self) -> None:
+        if self.index_path.exists():
+            with open(self.index_path, 'r') as file:
+                index = json.load(file)
+            self.entries = {entry.digest: entry for entry in map(LibraryEntry.load, index["brains"])}
+            self.duplicates = set(index["duplicates"])
+        else:
+            self.entries = {}
+            self.duplicates = set()
+
+    # сверяет индекс с содержимым папки: читается только список имен файлов, а не сами файлы
+    def refresh(self) -> None:
+        # пока файлы дописываются, папка отстает от индекса в памяти
+        if self.writer is not None and not self.writer.idle:
+            return
+
+        if self.path.exists():
+            file_names = {entry.name for entry in os.scandir(self.path)
+                          if entry.name.endswith(f".{Brain.file_extension}")}
+        else:
+            file_names = set()
+
+        changed = False
+        for digest, entry in list(self.entries.items()):
+            if entry.file_name not in file_names:
+                del self.entries[digest]
+                changed = True
+
+        if not self.duplicates <= file_names:
+            self.duplicates &= file_names
+            changed = True
+
+        indexed_file_names = {entry.file_name for entry in self.entries.values()} | self.duplicates
+        # файлы, сохраненные без индекса, например, в старом формате или с именем по хэшу
+        for file_name in sorted(file_names - indexed_file_names):
+            brain = Brain.load_from_file(str(self.path / file_name))
+            if brain.digest not in self.entries:
+                entry = LibraryEntry.from_brain(brain, file_name)
+                entry.mtime = os.path.getmtime(self.path / file_name)
+                self.entries[brain.digest] = entry
+            else:
+                self.duplicates.add(file_name)
+            changed = True
+
+        if changed:
+            self.write_index()
+
+    def save(self, brains: list[Brain]) -> None:
+        for brain in brains:
+            entry = LibraryEntry.from_brain(brain)
+            old_entry = self.entries.get(entry.digest)
+            # одинаковые мозги хранятся один раз, переписываются только изменившиеся сведения
+            if old_entry is not None:
+                entry.file_name = old_entry.file_name
+                if (old_entry.generation, old_entry.score, old_entry.name) == (entry.generation, entry.score,
+                                                                               entry.name):
+                    continue
+            # веса всегда хранятся в double, чтобы загруженный мозг считался так же, как сохраненный
+            self.write(self.path / entry.file_name, brain.dump_to_bytes(weight_size = 8))
+            self.entries[entry.digest] = entry
+        self.write_index()
+
+    def load(self, digest: str) -> Brain:
+        return Brain.load_from_file(str(self.path / self.entries[digest].file_name))
+
+    def get_latest(self) -> LibraryEntry | None:
+        if len(self.entries) > 0:
+            latest = max(self.entries.values(), key = lambda x: x.mtime)
+        else:
+            latest = None
+        return latest
@@ -0,0 +1,66 @@
+import csv
+import datetime
+import json
+import time
+from pathlib import Path
+
+
+# счетчики производительности одного поколения: время этапов тренировки, ходы и арены
+class GenerationPerformance:
+    # подготовка - мутация мозгов и создание арен, отбор - сортировка, кэш и сохранение
+    phases = ("preparation", "sensing", "inference", "movement", "food", "selection")
+
+    def __init__(self) -> None:
+        self.generation: int | None = None
+        self.start_time = time.perf_counter()
+        self.finish_time: float | None = None
+        self.phase_times = dict.fromkeys(self.phases, 0.0)
+        self.ticks = 0
+        self.arenas = 0
+
+    def add(self, phase: str, duration: float) -> None:
+        self.phase_times[phase] += duration
+
+    def finish(self, generation: int, ticks: int, arenas: int) -> None:
+        self.finish_time = time.perf_counter()
+        self.generation = generation
+        self.ticks = ticks
+        self.arenas = arenas
+
+    def dump(self) -> dict[str, int | float]:
+        duration = self.finish_time - self.start_time
+        return {
+            "generation": self.generation,
+            "time": duration,
+            "ticks": self.ticks,
+            "arenas": self.arenas,
+            "ticks_per_second": self.ticks / duration if duration > 0 else 0.0,
+            "arenas_per_second": self.arenas / duration if duration > 0 else 0.0,
+            **{f"{phase}_time": phase_time for phase, phase_time in self.phase_times.items()}
+        }
+
+
+# дописывает счетчики поколений в файл: построчный json или csv, в зависимости от расширения
+# в одном файле можно хранить много тренировок, они различаются временем начала
+class PerformanceLog:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.run = datetime.datetime.now().isoformat(timespec = "seconds")
+
+    def start_run(self) -> None:
+        self.run = datetime.datetime.now().isoformat(timespec = "seconds")
+
+    # одна строка на поколение, поэтому файл пишется сразу, а не в отдельном потоке
+    def append(self, performance: GenerationPerformance) -> None:
+        record = {"run": self.run, **performance.dump()}
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        if self.path.suffix == ".csv":
+            write_header = not self.path.exists() or self.path.stat().st_size == 0
+            with open(self.path, 'a', newline = "") as file:
+                writer = csv.DictWriter(file, fieldnames = list(record))
+                if write_header:
+                    writer.writeheader()
+                writer.writerow(record)
+        else:
+            with open(self.path, 'a') as file:
+                file.write(f"{json.dumps(record)}\n")
@@ -9,3 +9,7 @@ class Settings(CoreSettings):
         super().__init__()
 
         self.BRAINS_PATH = f"{self.APP_NAME}/brain"
+        self.CHECKPOINT_PATH = f"{self.APP_NAME}/checkpoint.snkt"
+        self.EPISODES_PATH = f"{self.APP_NAME}/episodes.snke"
+        self.PERFORMANCE_LOG_PATH = f"{self.LOG_FOLDER}/{self.APP_NAME}_performance.jsonl"
+        self.SWEEP_RESULTS_PATH = f"{self.LOG_FOLDER}/{self.APP_NAME}_sweep.csv"
@@ -46,17 +46,35 @@ class Train(ActionButton):
 
     def on_click(self, event: UIOnClickEvent) -> None:
         self.view.ui_manager.remove(self.action_tab)
-        self.view.start_generation = self.view.reference_brains[0].generation
-        self.view.max_generation = self.view.start_generation + int(self.action_tab.generations_amount.value)
-        self.view.generation_size_by_brain = self.action_tab.generation_size.value
-        self.view.reference_brains_amount = self.action_tab.reference_brains.value
-        self.view.prepare_training_arenas()
-        self.view.snake_training = True
-        self.view.best_brains = []
+        self.view.start_training(
+            int(self.action_tab.generations_amount.value),
+            self.action_tab.generation_size.value,
+            self.action_tab.reference_brains.value
+        )
         self.view.prepare_train_tab()
         self.view.window.set_update_rate(self.view.train_update_rate)
 
 
+class Resume(ActionButton):
+    def __init__(self, action_tab: "ActionTab", **kwargs) -> None:
+        super().__init__(action_tab, text = "Продолжить тренировку", **kwargs)
+
+    def on_click(self, event: UIOnClickEvent) -> None:
+        self.view.ui_manager.remove(self.action_tab)
+        self.view.resume_training()
+        self.view.prepare_train_tab()
+        self.view.window.set_update_rate(self.view.train_update_rate)
+
+
+class Replay(ActionButton):
+    def __init__(self, action_tab: "ActionTab", **kwargs) -> None:
+        super().__init__(action_tab, text = "Повтор тренировки", **kwargs)
+
+    def on_click(self, event: UIOnClickEvent) -> None:
+        super().on_click(event)
+        self.view.start_replay()
+
+
 class Back(ActionButton):
     def __init__(self, action_tab: "ActionTab", **kwargs) -> None:
         super().__init__(action_tab, text = "Назад", **kwargs)
@@ -160,11 +178,15 @@ class ActionTab(BoxLayout):
         self.reference_brains_label = ReferenceBrainsLabel(self)
         self.generation_size = GenerationSize(self)
         self.generation_size_label = GenerationSizeLabel(self)
+        self.resume = Resume(self)
+        self.replay = Replay(self)
 
         children = [
             Back(self),
             Release(self),
             Train(self),
+            self.resume,
+            self.replay,
             self.generations_amount_label,
             self.generations_amount,
             self.generation_size_label,
@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING
 import arcade.shape_list
 from arcade.shape_list import ShapeElementList
 
-from apps.snake.component.brain import Neuron
+from apps.snake.component.brain import Brain, Neuron
 from apps.snake.service.color import Color
 from apps.snake.settings import Settings
 from apps.snake.ui.mixin import SnakeStyleButtonMixin
@@ -25,8 +25,11 @@ class NeuronMap(SnakeStyleButtonMixin, TextureButton):
     output_step = 0.05
     outputs = list(float_range(*Neuron.output_borders, output_step))
 
-    def __init__(self, neuron: Neuron, **kwargs) -> None:
-        self.neuron = neuron
+    def __init__(self, brain: Brain, layer_index: int, neuron_index: int, **kwargs) -> None:
+        self.brain = brain
+        self.layer_index = layer_index
+        self.neuron_index = neuron_index
+        self.neuron = self.brain.layers[self.layer_index][self.neuron_index]
         texture = self.get_texture()
         super().__init__(width = texture.width, height = texture.height, texture = texture, **kwargs)
 
@@ -41,7 +44,8 @@ class NeuronMap(SnakeStyleButtonMixin, TextureButton):
                 texture = Texture.create_circle(self.radius, color = color)
                 self.__class__.default_textures[output] = texture
 
-        nearest_key = min(self.default_textures, key = lambda key: abs(key - self.neuron.output))
+        output = self.brain.get_neuron_output(self.layer_index, self.neuron_index)
+        nearest_key = min(self.default_textures, key = lambda key: abs(key - output))
         return self.default_textures[nearest_key]
 
     def update_texture(self) -> None:
@@ -72,8 +76,9 @@ class BrainMap(BoxLayout):
         self.brain = self.view.released_arena.snake.brain
         self.all_neuron_maps = []
         layer_maps = []
-        for layer in self.brain.layers:
-            neuron_maps: list[NeuronMap | Label] = [NeuronMap(neuron) for neuron in layer]
+        for layer_index, layer in enumerate(self.brain.layers):
+            neuron_maps: list[NeuronMap | Label] = [NeuronMap(self.brain, layer_index, index)
+                                                    for index in range(len(layer))]
             self.all_neuron_maps.extend(neuron_maps)
 
             label = LayerLabel(str(len(neuron_maps)))
@@ -94,5 +94,8 @@ class RestartButton(SnakeStyleButtonMixin, TextureButton):
         super().__init__(**kwargs)
 
     def on_click(self, event: UIOnClickEvent) -> None:
-        self.view.released_arena = self.view.prepare_released_arena()
-        self.view.prepare_brain_map()
+        if self.view.snake_replaying:
+            self.view.seek_replay(0)
+        else:
+            self.view.released_arena = self.view.prepare_released_arena()
+            self.view.prepare_brain_map()
@@ -1,8 +1,4 @@
-import copy
-import glob
 import math
-import os
-from pathlib import Path
 from typing import TYPE_CHECKING
 
 from arcade.gui import UIEvent, UIMouseScrollEvent, UIOnClickEvent, UITextureButton
@@ -10,6 +6,7 @@ from pyglet.event import EVENT_HANDLED, EVENT_UNHANDLED
 
 from apps.snake.component.brain import Brain
 from apps.snake.service.color import Color
+from apps.snake.service.library import LibraryEntry
 from apps.snake.settings import Settings
 from apps.snake.ui.mixin import SnakeStyleButtonMixin
 from core.service.anchor import Anchor
@@ -46,32 +43,28 @@ class Load(SnakeStyleButtonMixin, TextureButton):
         "disabled": latest_normal_style
     }
 
-    def __init__(self, load_tab: "LoadTab", path: str | None, **kwargs) -> None:
+    def __init__(self, load_tab: "LoadTab", entry: LibraryEntry | None, **kwargs) -> None:
         self.load_tab = load_tab
         self.view = self.load_tab.view
-        self.path = path
+        # мозг загружается из библиотеки только при выборе, для списка хватает сведений из индекса
+        self.entry = entry
         self.index: int | None = None
 
-        if self.path is None:
-            self.brain = Brain.get_default()
-        else:
-            self.brain = Brain.load_from_file(self.path)
-
         super().__init__(width = self.default_width, height = self.default_height, **kwargs)
         self.place_text(anchor_x = Anchor.X.LEFT, align_x = 10)
 
     def __gt__(self, other: "Load") -> bool:
-        if self.path is not None and other.path is not None:
+        if self.entry is not None and other.entry is not None:
             brain_params = ["score", "generation"]
             for param in brain_params:
-                self_param = getattr(self.brain, param)
-                other_param = getattr(other.brain, param)
+                self_param = getattr(self.entry, param)
+                other_param = getattr(other.entry, param)
                 if self_param != other_param:
                     greater = self_param > other_param
                     break
             else:
-                greater = self.brain.name > other.brain.name
-        elif self.path is None:
+                greater = self.entry.name > other.entry.name
+        elif self.entry is None:
             greater = True
         else:
             greater = False
@@ -86,23 +79,25 @@ class Load(SnakeStyleButtonMixin, TextureButton):
         index_str = index_str.rjust(index_str_length)
         text = [index_str]
 
-        if self.path is None:
+        if self.entry is None:
             text.append("Новый")
         else:
-            max_generation_len = max(len(str(x.brain.generation)) for x in self.load_tab.loads.values())
-            generation_str = str(self.brain.generation)
+            max_generation_len = max(len(str(x.entry.generation)) for x in self.load_tab.loads.values()
+                                     if x.entry is not None)
+            generation_str = str(self.entry.generation)
             generation_str_len = (max_generation_len - len(generation_str)) * spaces_to_char + len(generation_str)
             generation_str = generation_str.ljust(generation_str_len)
 
-            max_score_len = max(len(str(x.brain.pretty_score)) for x in self.load_tab.loads.values())
-            score_str = str(self.brain.pretty_score)
+            max_score_len = max(len(str(x.entry.pretty_score)) for x in self.load_tab.loads.values()
+                                if x.entry is not None)
+            score_str = str(self.entry.pretty_score)
             score_str_len = (max_score_len - len(score_str)) * spaces_to_char + len(score_str)
             score_str = score_str.ljust(score_str_len)
 
             extend = [
                 generation_str,
                 score_str,
-                self.brain.name
+                self.entry.name
             ]
             text.extend(extend)
         text = LoadTabLabel.separator.join(text)
@@ -110,9 +105,16 @@ class Load(SnakeStyleButtonMixin, TextureButton):
         if self.text != text:
             self.text = text
 
+    def load_brain(self) -> Brain:
+        if self.entry is None:
+            brain = Brain.get_default()
+        else:
+            brain = self.view.brain_library.load(self.entry.digest)
+        return brain
+
     def on_click(self, event: UIOnClickEvent) -> None:
         self.view.ui_manager.remove(self.load_tab)
-        self.view.reference_brains = [copy.deepcopy(self.brain)]
+        self.view.reference_brains = [self.load_brain()]
         self.view.prepare_actions_tab()
 
     def update_style(self, latest: bool) -> None:
@@ -139,6 +141,7 @@ class LoadTab(BoxLayout):
 
     def __init__(self, view: "SimulationView", **kwargs) -> None:
         self.view = view
+        # отпечаток мозга -> кнопка загрузки, None - новый мозг
         self.loads: dict[str | None, Load] = {}
         self.max_loads_amount = (self.view.window.height - self.gap) // Load.default_height - 1
         self.label = LoadTabLabel()
@@ -163,26 +166,23 @@ class LoadTab(BoxLayout):
         self.move_to(0, self.view.window.height, Anchor.X.LEFT, Anchor.Y.TOP)
 
     def update_loads(self) -> None:
-        if Path(self.settings.BRAINS_PATH).exists():
-            new_paths = set(glob.glob(f"{self.settings.BRAINS_PATH}/*.{Brain.file_extension}"))
-        else:
-            new_paths = set()
-
-        if len(new_paths) > 0:
-            latest_path = max(new_paths, key = os.path.getctime)
+        library = self.view.brain_library
+        library.refresh()
+        latest_entry = library.get_latest()
+        if latest_entry is None:
+            latest_digest = None
         else:
-            latest_path = None
-        new_paths.add(None)
+            latest_digest = latest_entry.digest
 
         self.load_pane.clear()
-        for child in self.load_pane.children:
-            if isinstance(child, Load) and child.path not in new_paths:
-                del self.loads[child.path]
+        self.loads = {digest: load for digest, load in self.loads.items()
+                      if digest is None or library.entries.get(digest) is load.entry}
 
-        for path in new_paths:
-            if path not in self.loads:
-                load = Load(self, path)
-                self.loads[path] = load
+        if None not in self.loads:
+            self.loads[None] = Load(self, None)
+        for digest, entry in library.entries.items():
+            if digest not in self.loads:
+                self.loads[digest] = Load(self, entry)
 
         self.loads = {key: value for key, value in sorted(self.loads.items(), key = lambda x: x[1], reverse = True)}
         for index, load in enumerate(self.loads.values()):
@@ -190,7 +190,7 @@ class LoadTab(BoxLayout):
             load.update_text()
         for load in self.get_visible_loads():
             self.load_pane.add(load)
-            load.update_style(load.path == latest_path)
+            load.update_style(load.entry is not None and load.entry.digest == latest_digest)
 
     def on_event(self, event: UIEvent) -> bool | None:
         if isinstance(event, UIMouseScrollEvent):
@@ -0,0 +1,116 @@
+from typing import TYPE_CHECKING
+
+from arcade.gui import UIOnChangeEvent
+
+from apps.snake.service.color import Color
+from apps.snake.ui.mixin import SnakeStyleButtonMixin, SnakeStyleSliderMixin
+from core.service.anchor import Anchor
+from core.texture import Texture
+from core.ui.layout.box_layout import BoxLayout
+from core.ui.slider.step_slider import StepSlider
+from core.ui.text.label import Label as CoreLabel
+
+
+if TYPE_CHECKING:
+    from apps.snake.view.simulation import SimulationView
+
+
+class ReplayLabel(SnakeStyleButtonMixin, CoreLabel):
+    default_width = 400
+    default_height = 50
+
+    def __init__(self, replay_tab: "ReplayTab", **kwargs) -> None:
+        self.replay_tab = replay_tab
+        self.view = self.replay_tab.view
+        super().__init__(width = self.default_width, height = self.default_height, **kwargs)
+        self.place_text(Anchor.X.LEFT, align_x = 5)
+        self.update_text()
+
+    def get_text(self) -> str:
+        raise NotImplementedError()
+
+    def update_text(self) -> None:
+        text = self.get_text()
+        if self.text != text:
+            self.text = text
+
+
+class EpisodeLabel(ReplayLabel):
+    def get_text(self) -> str:
+        episode = self.view.episode_player.episode
+        return f"Поколение: {episode.generation}, счёт: {round(episode.score, 3)}"
+
+
+class TickLabel(ReplayLabel):
+    def get_text(self) -> str:
+        return f"Ход: {self.view.episode_player.tick}/{self.view.episode_player.episode.ticks}"
+
+
+class ReplaySlider(SnakeStyleSliderMixin, StepSlider):
+    def __init__(self, replay_tab: "ReplayTab", value: int, max_value: int) -> None:
+        super().__init__(
+            step = 1,
+            value = value,
+            min_value = 0,
+            max_value = max_value,
+            width = ReplayLabel.default_width
+        )
+        self.replay_tab = replay_tab
+        self.view = self.replay_tab.view
+
+
+# выбор эпизода по поколению, показывается, только если эпизодов больше одного
+class EpisodeSlider(ReplaySlider):
+    def on_change(self, event: UIOnChangeEvent) -> None:
+        super().on_change(event)
+        self.view.select_episode(int(self.value))
+
+
+# перемотка к любому ходу эпизода
+class TickSlider(ReplaySlider):
+    def on_change(self, event: UIOnChangeEvent) -> None:
+        super().on_change(event)
+        self.view.seek_replay(int(self.value))
+
+    def set_max_value(self, max_value: int) -> None:
+        self.max_value = max_value
+        self.values = list(range(max_value + 1))
+
+
+class ReplayTab(BoxLayout):
+    def __init__(self, view: "SimulationView", **kwargs) -> None:
+        self.view = view
+        self.episode_label = EpisodeLabel(self)
+        self.tick_label = TickLabel(self)
+        self.tick_slider = TickSlider(self, 0, self.view.episode_player.episode.ticks)
+        children = [self.episode_label]
+        if len(self.view.episodes) > 1:
+            episode_index = self.view.episodes.index(self.view.episode_player.episode)
+            children.append(EpisodeSlider(self, episode_index, len(self.view.episodes) - 1))
+        children.extend([self.tick_label, self.tick_slider])
+        super().__init__(children = children, **kwargs)
+
+        self.with_padding(all = self.gap)
+        self.fit_content()
+        self.with_background(
+            texture = Texture.create_rounded_rectangle(
+                self.size,
+                5,
+                color = Color.NORMAL,
+                border_color = Color.BORDER
+            )
+        )
+        self.move_to(0, self.view.window.height, Anchor.X.LEFT, Anchor.Y.TOP)
+
+    # выбран другой эпизод
+    def update_episode(self) -> None:
+        self.tick_slider.set_max_value(self.view.episode_player.episode.ticks)
+        self.update_tick()
+
+    def update_tick(self) -> None:
+        self.tick_slider.value = self.view.episode_player.tick
+        self.update_labels()
+
+    def update_labels(self) -> None:
+        self.episode_label.update_text()
+        self.tick_label.update_text()
@@ -36,34 +36,50 @@ class TrainLabel(SnakeStyleButtonMixin, CoreLabel):
 
 class GenerationLabel(TrainLabel):
     def get_text(self) -> str:
-        return f"Поколение: {self.view.reference_brains[0].generation}/{self.view.max_generation}"
+        return f"Поколение: {self.view.trainer.reference_brains[0].generation}/{self.view.trainer.max_generation}"
 
 
 class ScoreLabel(TrainLabel):
     def get_text(self) -> str:
-        return f"Последний счёт: {tuple(x.pretty_score for x in self.view.reference_brains)}"
+        return f"Последний счёт: {tuple(x.pretty_score for x in self.view.trainer.reference_brains)}"
 
 
 class AgeLabel(TrainLabel):
     def get_text(self) -> str:
-        return f"Последний возраст: {tuple(x.age for x in self.view.reference_brains)}"
+        return f"Последний возраст: {tuple(x.age for x in self.view.trainer.reference_brains)}"
 
 
 class ArenaLabel(TrainLabel):
     def get_text(self) -> str:
-        return f"Арена: {self.view.training_arena_index}/{len(self.view.training_arenas)}"
+        return f"Арена: {self.view.trainer.training_arena_index}/{len(self.view.trainer.training_arenas)}"
+
+
+class SavedTicksLabel(TrainLabel):
+    def get_text(self) -> str:
+        return f"Пропущено ходов: {self.view.trainer.total_saved_ticks}"
+
+
+class CacheLabel(TrainLabel):
+    def get_text(self) -> str:
+        return f"Из кэша: {self.view.trainer.fitness_cache.hit_rate:.0%}"
+
+
+class SpeedLabel(TrainLabel):
+    def get_text(self) -> str:
+        return f"Ходов в секунду: {round(self.view.scheduler.cycles_per_second)}"
 
 
 class AverageTimeLabel(TrainLabel):
     average_time: float = None
 
     def get_text(self) -> str:
-        if self.view.last_generation_trained_time is None:
+        trainer = self.view.trainer
+        if trainer.last_generation_trained_time is None:
             time = "∞"
         else:
             try:
-                all_time = self.view.last_generation_trained_time - self.view.training_start_time
-                trained_generations = self.view.reference_brains[0].generation - self.view.start_generation
+                all_time = trainer.last_generation_trained_time - trainer.training_start_time
+                trained_generations = trainer.reference_brains[0].generation - trainer.start_generation
                 self.__class__.average_time = all_time.total_seconds() / trained_generations
                 time = self.get_average_time()
             except ZeroDivisionError:
@@ -79,7 +95,7 @@ class EstimatedTime(TrainLabel):
         if self.train_tab.average_time_label.average_time is None:
             time = "∞"
         else:
-            generations_left = self.view.max_generation - self.view.reference_brains[0].generation
+            generations_left = self.view.trainer.max_generation - self.view.trainer.reference_brains[0].generation
             time = self.train_tab.average_time_label.get_average_time() * generations_left
         return f"Оставшееся время: {time}"
 
@@ -95,6 +111,9 @@ class TrainTab(BoxLayout):
             ScoreLabel(self),
             AgeLabel(self),
             ArenaLabel(self),
+            SavedTicksLabel(self),
+            CacheLabel(self),
+            SpeedLabel(self),
             self.average_time_label,
             EstimatedTime(self)
         ]
@@ -1,20 +1,23 @@
-import copy
-import datetime
 import time
-from pathlib import Path
 
 from apps.snake.component.arena import Arena
 from apps.snake.component.brain import Brain
+from apps.snake.component.replay import Episode, EpisodePlayer
 from apps.snake.component.snake import Snake
+from apps.snake.component.trainer import Trainer
 from apps.snake.component.world import World
+from apps.snake.service.library import BrainLibrary
 from apps.snake.service.color import Color
 from apps.snake.settings import Settings
 from apps.snake.ui.action_tab import ActionTab
 from apps.snake.ui.brain_map import BrainMap
 from apps.snake.ui.control import ExitButton, PauseButton, RestartButton, SpeedButton
 from apps.snake.ui.load_tab import LoadTab
+from apps.snake.ui.replay_tab import ReplayTab
 from apps.snake.ui.train_tab import TrainTab
 from core.service.anchor import Anchor
+from core.service.scheduler import FrameScheduler
+from core.service.writer import BackgroundWriter
 from core.ui.layout.box_layout import BoxLayout
 from core.view.simulation import SimulationView as CoreSimulationView
 
@@ -22,8 +25,8 @@ from core.view.simulation import SimulationView as CoreSimulationView
 class SimulationView(CoreSimulationView):
     settings = Settings()
     update_rate = 1 / 60
-    train_update_rate = 1 / 10**10
-    max_latency = 1 / 20
+    # во время тренировки кадр делится между отрисовкой и ходами змей
+    train_update_rate = 1 / 60
     background_color = Color.BACKGROUND
 
     exit_button_class = ExitButton
@@ -34,6 +37,7 @@ class SimulationView(CoreSimulationView):
     load_tab: LoadTab = None
     action_tab: ActionTab = None
     train_tab: TrainTab = None
+    replay_tab: ReplayTab = None
 
     world: World = None
     snake_perform_timer: float
@@ -41,22 +45,22 @@ class SimulationView(CoreSimulationView):
     snake_released: bool = False
     brain_map: BrainMap = None
 
-    reference_brains_amount: int | None
+    # лучшие эпизоды поколений последней тренировки воспроизводятся по записи, без мозга
+    episodes: list[Episode] = None
+    episode_player: EpisodePlayer = None
+    snake_replaying: bool = False
+
     reference_brains: list[Brain] = None
     snake_training: bool
-    start_generation: int | None = None
-    max_generation: int | None = None
-    generation_size_by_brain: int | None = None
-    training_arena_index: int
-    training_arenas: list[Arena] = None
+    trainer: Trainer = None
+    scheduler: FrameScheduler = None
     show_training = False
     show_sensored_tiles = False
 
-    training_start_time: datetime.datetime | None
-    last_generation_trained_time: datetime.datetime | None
-    best_brains_amount = 3
-    best_brains: list[Brain] | None
-    save_best_brains = False
+    brain_writer: BackgroundWriter = None
+    brain_library: BrainLibrary = None
+    # список загрузок обновляется, когда сохраняемые мозги будут записаны
+    loads_outdated = False
 
     def prepare_buttons(self) -> None:
         layout = BoxLayout()
@@ -82,8 +86,8 @@ class SimulationView(CoreSimulationView):
             self.world = World(self)
 
     def prepare_released_arena(self) -> Arena:
-        world_map = copy.deepcopy(self.world.reference_map)
-        snake = Snake(self.reference_brains[0], world_map)
+        world_map = self.world.reference_map.copy()
+        snake = Snake(self.reference_brains[0].clone(), world_map)
         arena = Arena(snake)
         self.snake_perform_timer = 0
         return arena
@@ -96,21 +100,77 @@ class SimulationView(CoreSimulationView):
         self.brain_map.move_to(0, self.window.height, Anchor.X.LEFT, Anchor.Y.TOP)
         self.ui_manager.add(self.brain_map)
 
-    def prepare_training_arenas(self) -> None:
-        if self.training_start_time is None:
-            self.training_start_time = datetime.datetime.now()
+    def prepare_trainer(self) -> None:
+        if self.trainer is None:
+            self.trainer = Trainer(self.world.reference_map, self.brain_library, self.brain_writer)
+        if self.scheduler is None:
+            self.scheduler = FrameScheduler(self.train_update_rate)
+
+    def start_training(self, generations_amount: int, generation_size_by_brain: int,
+                       reference_brains_amount: int) -> None:
+        self.trainer.start(self.reference_brains, generations_amount, generation_size_by_brain, reference_brains_amount)
+        self.scheduler.reset()
+        self.snake_training = True
+        self.follow_training()
+
+    # продолжает тренировку, прерванную закрытием окна или падением, с последней контрольной точки
+    def resume_training(self) -> None:
+        self.trainer.resume()
+        self.reference_brains = self.trainer.reference_brains
+        self.scheduler.reset()
+        self.snake_training = True
+        self.follow_training()
+
+    # эпизоды тренировки из этого окна или последней сохраненной, в том числе тренировки без окна
+    # файл эпизодов общий, а плитки окна нарисованы по его карте, поэтому эпизоды с картой другого размера пропускаются
+    def load_episodes(self) -> list[Episode]:
+        if len(self.trainer.episodes) > 0:
+            episodes = self.trainer.episodes
+        elif self.trainer.episodes_path.exists():
+            episodes = Episode.load_list_from_file(self.trainer.episodes_path)
         else:
-            self.last_generation_trained_time = datetime.datetime.now()
+            episodes = []
+        geometry = self.world.map_geometry
+        return [episode for episode in episodes
+                if (episode.tiles_in_radius, episode.border_thickness) == (geometry.tiles_in_radius,
+                                                                           geometry.border_thickness)]
+
+    @property
+    def episodes_exist(self) -> bool:
+        return len(self.load_episodes()) > 0
+
+    # сначала показывается лучший эпизод, а при равном счете - более позднего поколения
+    def start_replay(self) -> None:
+        self.episodes = self.load_episodes()
+        self.select_episode(max(range(len(self.episodes)), key = lambda x: (self.episodes[x].score, x)))
+        self.snake_released = False
+        self.snake_replaying = True
+        self.prepare_replay_tab()
 
-        self.training_arenas = [Arena(Snake(brain.mutate(), copy.deepcopy(self.world.reference_map))) for _ in
-                                range(self.generation_size_by_brain - 1) for brain in self.reference_brains]
-        self.training_arenas.extend(
-            Arena(Snake(brain, copy.deepcopy(self.world.reference_map))) for brain in self.reference_brains
-        )
-        self.training_arena_index = 0
+    def select_episode(self, index: int) -> None:
+        self.episode_player = EpisodePlayer(self.episodes[index])
+        self.released_arena = self.episode_player.arena
+        self.snake_perform_timer = 0
+        if self.replay_tab is not None:
+            self.replay_tab.update_episode()
+
+    def seek_replay(self, tick: int) -> None:
+        self.episode_player.seek(tick)
+        self.snake_perform_timer = 0
+        self.replay_tab.update_tick()
 
-        if self.show_training:
-            self.released_arena = self.training_arenas[self.training_arena_index]
+    def prepare_replay_tab(self) -> None:
+        if self.replay_tab is not None:
+            self.ui_manager.remove(self.replay_tab)
+
+        self.replay_tab = ReplayTab(self)
+        self.ui_manager.add(self.replay_tab)
+
+    # при показе тренировки отображается арена, которую сейчас обрабатывает тренер
+    def follow_training(self) -> None:
+        arena = self.trainer.current_arena
+        if self.show_training and arena is not None and arena is not self.released_arena:
+            self.released_arena = arena
             self.prepare_brain_map()
 
     def prepare_load_tab(self) -> None:
@@ -124,6 +184,8 @@ class SimulationView(CoreSimulationView):
         if self.action_tab is None:
             self.action_tab = ActionTab(self)
 
+        self.action_tab.resume.disabled = not self.trainer.checkpoint_exists
+        self.action_tab.replay.disabled = not self.episodes_exist
         self.ui_manager.add(self.action_tab)
 
     def prepare_train_tab(self) -> None:
@@ -134,18 +196,23 @@ class SimulationView(CoreSimulationView):
 
     def on_show_view(self) -> None:
         super().on_show_view()
+        if self.brain_writer is None:
+            self.brain_writer = BackgroundWriter("brain writer")
+        if self.brain_library is None:
+            self.brain_library = BrainLibrary(writer = self.brain_writer)
         self.prepare_buttons()
         self.prepare_world()
+        self.prepare_trainer()
         self.prepare_load_tab()
         self.snake_training = False
-        self.training_start_time = None
-        self.last_generation_trained_time = None
 
     def on_hide_view(self) -> None:
         super().on_hide_view()
         self.snake_released = False
+        self.snake_replaying = False
 
     def on_draw(self) -> None:
+        start = time.perf_counter()
         self.speed_button.update_text()
         super().on_draw()
 
@@ -160,6 +227,13 @@ class SimulationView(CoreSimulationView):
 
         if self.snake_training:
             self.train_tab.update_labels()
+        if self.snake_replaying:
+            self.replay_tab.update_labels()
+        self.scheduler.measure_draw(time.perf_counter() - start)
+
+    # окно свернуто
+    def on_hide(self) -> None:
+        self.scheduler.minimized = True
 
     def on_update(self, delta_time: float) -> None:
         if self.snake_released and not self.pause_button.enabled:
@@ -167,71 +241,44 @@ class SimulationView(CoreSimulationView):
             if self.released_arena.snake.alive and self.snake_perform_timer > (period := 1 / self.speed_button.speed):
                 self.snake_perform_timer -= period
                 self.released_arena.perform()
+        elif self.snake_replaying and not self.pause_button.enabled:
+            self.snake_perform_timer += delta_time
+            if not self.episode_player.finished and self.snake_perform_timer > (period := 1 / self.speed_button.speed):
+                self.snake_perform_timer -= period
+                self.episode_player.step()
+                self.replay_tab.update_tick()
         elif self.snake_training:
-            latency = 0
-            cycles = 100
-            generation_trained = False
-
-            while latency < self.max_latency and not generation_trained:
-                start = time.time()
-                generation_trained = self.train(cycles)
-                finish = time.time()
-                latency += finish - start
+            generation_trained = self.scheduler.run(self.trainer.train, lambda: self.trainer.performed_cycles)
+            self.follow_training()
 
             if generation_trained:
-                for arena in self.training_arenas:
-                    arena.snake.brain.score = arena.snake.get_score()
-                    arena.snake.brain.age = arena.snake.age
-                brains = [x.snake.brain for x in
-                          sorted(self.training_arenas, key = lambda x: x.snake.brain.score, reverse = True)]
-
-                if self.save_best_brains:
-                    self.best_brains.extend(brains[:self.best_brains_amount])
-                    self.best_brains.sort(key = lambda x: x.score, reverse = True)
-                    self.best_brains = self.best_brains[:self.best_brains_amount]
-
-                self.reference_brains = brains[:self.reference_brains_amount]
-                for brain in self.reference_brains:
-                    brain.generation += 1
-
-                self.reference_brains = copy.deepcopy(self.reference_brains)
-                if self.reference_brains[0].generation < self.max_generation:
-                    self.prepare_training_arenas()
+                self.trainer.finish_generation()
+                if self.trainer.training:
+                    self.follow_training()
                 else:
-                    folder = Path(self.settings.BRAINS_PATH)
-                    if not folder.exists():
-                        folder.mkdir(parents = True)
-                    if self.save_best_brains:
-                        for brain in self.best_brains:
-                            brain.dump_to_file(f"{folder}/{brain.save_name}")
-                    for brain in self.reference_brains:
-                        brain.dump_to_file(f"{folder}/{brain.save_name}")
-
+                    self.reference_brains = self.trainer.reference_brains
                     self.snake_training = False
-                    self.max_generation = None
                     self.ui_manager.remove(self.train_tab)
                     self.prepare_load_tab()
+                    self.loads_outdated = True
                     self.window.set_update_rate(self.update_rate)
 
-    def train(self, cycles: int) -> bool:
-        for _ in range(cycles):
-            if self.training_arena_index < len(self.training_arenas):
-                arena = self.training_arenas[self.training_arena_index]
-                if arena.snake.alive:
-                    arena.perform()
-                else:
-                    self.training_arena_index += 1
-                    if self.show_training and self.training_arena_index < len(self.training_arenas):
-                        self.released_arena = self.training_arenas[self.training_arena_index]
-                        self.prepare_brain_map()
-            else:
-                generation_trained = True
-                break
-        else:
-            generation_trained = False
-        return generation_trained
+        if self.loads_outdated and self.brain_writer.idle:
+            self.loads_outdated = False
+            self.load_tab.update_loads()
 
+    # пока пользователь работает с окном, тренировка уступает ему часть кадра
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int) -> None:
         super().on_mouse_press(x, y, button, modifiers)
+        self.scheduler.notify_interaction()
         tile = self.world.position_to_tile((x, y))
         self.logger.debug(tile)
+
+    def on_mouse_motion(self, x: int, y: int, dx: int, dy: int) -> None:
+        self.scheduler.notify_interaction()
+
+    def on_mouse_scroll(self, x: int, y: int, scroll_x: int, scroll_y: int) -> None:
+        self.scheduler.notify_interaction()
+
+    def on_key_press(self, symbol: int, modifiers: int) -> None:
+        self.scheduler.notify_interaction()
@@ -0,0 +1,104 @@
+import time
+from typing import Callable
+
+
+# делит кадр между отрисовкой и фоновой работой, которая выполняется срезами из нескольких циклов
+# размер среза подбирается по измеренной стоимости цикла так, чтобы работа укладывалась в бюджет кадра
+class FrameScheduler:
+    # доля кадра, которую получает работа, пока пользователь взаимодействует с окном
+    interactive_share = 0.3
+    # доля кадра, которую работа получает всегда, даже если отрисовка не укладывается в кадр
+    min_share = 0.1
+    # сколько секунд после последнего действия пользователя окно считается занятым
+    interaction_timeout = 0.5
+    # вес нового измерения в скользящих средних
+    smoothing = 0.2
+    # на совсем маленьких срезах накладные расходы на вызов работы становятся заметнее самой работы
+    min_cycles = 10
+    # как часто пересчитывается достигнутое количество циклов в секунду
+    rate_period = 0.5
+
+    def __init__(self, frame_time: float) -> None:
+        self.frame_time = frame_time
+        # среднее время одного цикла и отрисовки кадра
+        self.cycle_time: float | None = None
+        self.draw_time = 0.0
+        self.last_interaction_time: float | None = None
+        # свернутое окно не отрисовывается, поэтому работа получает весь кадр
+        self.minimized = False
+
+        self.cycles_per_second = 0.0
+        self.rate_start_time: float | None = None
+        self.rate_start_cycles = 0
+
+    def reset(self) -> None:
+        self.cycles_per_second = 0.0
+        self.rate_start_time = None
+
+    def notify_interaction(self) -> None:
+        self.last_interaction_time = time.perf_counter()
+
+    @property
+    def interacting(self) -> bool:
+        return (self.last_interaction_time is not None
+                and time.perf_counter() - self.last_interaction_time < self.interaction_timeout)
+
+    @property
+    def budget(self) -> float:
+        if self.minimized:
+            budget = self.frame_time
+        elif self.interacting:
+            budget = max(self.frame_time * self.interactive_share - self.draw_time, self.frame_time * self.min_share)
+        else:
+            budget = max(self.frame_time - self.draw_time, self.frame_time * self.interactive_share)
+        return budget
+
+    def get_average(self, average: float | None, value: float) -> float:
+        if average is None:
+            average = value
+        else:
+            average += (value - average) * self.smoothing
+        return average
+
+    def measure_draw(self, draw_time: float) -> None:
+        self.draw_time = self.get_average(self.draw_time, draw_time)
+        self.minimized = False
+
+    def get_cycles(self, remaining_time: float) -> int:
+        if self.cycle_time is None:
+            cycles = self.min_cycles
+        else:
+            cycles = max(self.min_cycles, int(remaining_time / self.cycle_time))
+        return cycles
+
+    # work(cycles) выполняет срез и возвращает True, если работа закончена
+    # counter() - сколько циклов выполнено всего, по нему измеряется стоимость цикла
+    # за кадр выполняется хотя бы один срез, чтобы работа шла и при исчерпанном бюджете
+    def run(self, work: Callable[[int], bool], counter: Callable[[], int]) -> bool:
+        budget = self.budget
+        start = time.perf_counter()
+        elapsed = 0.0
+        finished = False
+
+        while not finished and (elapsed == 0 or elapsed < budget):
+            cycles_before = counter()
+            slice_start = time.perf_counter()
+            finished = work(self.get_cycles(budget - elapsed))
+            slice_finish = time.perf_counter()
+            performed_cycles = counter() - cycles_before
+            if performed_cycles > 0:
+                self.cycle_time = self.get_average(self.cycle_time, (slice_finish - slice_start) / performed_cycles)
+            elapsed = slice_finish - start
+
+        self.update_rate(counter())
+        return finished
+
+    def update_rate(self, cycles: int) -> None:
+        now = time.perf_counter()
+        if self.rate_start_time is None:
+            self.rate_start_time = now
+            self.rate_start_cycles = cycles
+        elif now - self.rate_start_time >= self.rate_period:
+            self.cycles_per_second = (cycles - self.rate_start_cycles) / (now - self.rate_start_time)
+            self.rate_start_time = now
+            self.rate_start_cycles = cycles
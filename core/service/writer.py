@@ -0,0 +1,55 @@
+import atexit
+import os
+import queue
+import threading
+from pathlib import Path
+
+from logger import Logger
+
+
+# записывает файлы в отдельном потоке, чтобы обновление окна не ждало диск
+class BackgroundWriter:
+    def __init__(self, name: str = "writer") -> None:
+        self.logger = Logger(f"{self.__class__}.{name}")
+        # None вместо данных - файл удаляется
+        self.queue = queue.Queue[tuple[str, bytes | None]]()
+        self.thread = threading.Thread(target = self.run, name = name, daemon = True)
+        self.thread.start()
+        # незаписанные файлы не должны теряться при выходе
+        atexit.register(self.wait)
+
+    @property
+    def idle(self) -> bool:
+        return self.queue.unfinished_tasks == 0
+
+    def write(self, path: str | Path, data: bytes) -> None:
+        self.queue.put((str(path), data))
+
+    # удаление встает в очередь после записей, поэтому ранее отправленный файл не появится снова
+    def remove(self, path: str | Path) -> None:
+        self.queue.put((str(path), None))
+
+    def wait(self) -> None:
+        self.queue.join()
+
+    # файл заменяется целиком, чтобы не оставлять недописанных файлов
+    @staticmethod
+    def write_atomically(path: str | Path, data: bytes) -> None:
+        Path(path).parent.mkdir(parents = True, exist_ok = True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    def run(self) -> None:
+        while True:
+            path, data = self.queue.get()
+            try:
+                if data is None:
+                    Path(path).unlink(missing_ok = True)
+                else:
+                    self.write_atomically(path, data)
+            except OSError:
+                self.logger.exception(f"Failed to write {path}")
+            finally:
+                self.queue.task_done()
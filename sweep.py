@@ -0,0 +1,85 @@
+import random
+import time
+
+import tap
+
+from apps.snake.component.map import Map, MapGeometry
+from apps.snake.component.sweep import ParameterRange, ParameterValues, SweepRunner, get_grid, get_random_samples
+from apps.snake.service.library import BrainLibrary
+from apps.snake.settings import Settings
+from train import load_brain
+
+
+class ArgumentParser(tap.Tap):
+    # параметр=значения: через запятую для перебора сетки или min:max для случайного поиска
+    parameters: list[str]
+    samples: int | None = None  # количество наборов случайного поиска, по умолчанию - перебор всей сетки
+    repeats: int = 1  # сколько раз с разными зернами тренировать каждый набор параметров
+    generations: int = 50  # количество поколений в каждой тренировке
+    target_score: float | None = None  # тренировка заканчивается, как только лучший счет достигнет цели
+    processes: int | None = None  # количество процессов, по умолчанию - по числу ядер
+    results: str = Settings().SWEEP_RESULTS_PATH  # таблица результатов, строки дописываются в конец
+    brain: str | None = None  # отпечаток мозга из библиотеки или путь к файлу мозга, по умолчанию - новый мозг
+    seed: int | None = None  # зерно генератора случайных чисел
+    food_seed: int | None = None  # одинаковая еда для всех змей
+    tiles_in_radius: int = 10  # радиус мира в плитках
+    border_thickness: int = 1  # толщина границы мира в плитках
+
+
+def parse_number(text: str) -> int | float:
+    try:
+        number = int(text)
+    except ValueError:
+        number = float(text)
+    return number
+
+
+def parse_parameter(text: str) -> tuple[str, ParameterValues | ParameterRange]:
+    name, values = text.split("=")
+    if ":" in values:
+        low, high = values.split(":")
+        parsed_values = (parse_number(low), parse_number(high))
+    else:
+        parsed_values = [parse_number(x) for x in values.split(",")]
+    return name, parsed_values
+
+
+# перебор параметров тренировки: python sweep.py --parameters max_mutation_spread=0.05,0.1,0.2 generation_size=5,10
+def sweep() -> None:
+    arguments = ArgumentParser().parse_args()
+    if arguments.seed is not None:
+        random.seed(arguments.seed)
+
+    values = dict(parse_parameter(x) for x in arguments.parameters)
+    if arguments.samples is None:
+        ranges = [name for name, parameter_values in values.items() if isinstance(parameter_values, tuple)]
+        if len(ranges) > 0:
+            raise ValueError(f"Ranges are allowed only with --samples: {', '.join(ranges)}")
+        parameter_sets = get_grid(values)
+    else:
+        parameter_sets = get_random_samples(values, arguments.samples)
+
+    reference_map = Map(
+        MapGeometry.get(arguments.tiles_in_radius, arguments.border_thickness),
+        food_seed = arguments.food_seed
+    )
+    runner = SweepRunner(arguments.results, arguments.generations, arguments.target_score, arguments.processes)
+    brain = load_brain(BrainLibrary(), arguments.brain)
+
+    summaries = []
+    start = time.time()
+    jobs_amount = len(parameter_sets) * arguments.repeats
+    for index, parameters, seed, progress in runner.run(parameter_sets, reference_map, brain, arguments.repeats):
+        generation, best_score, elapsed_time = max(progress, key = lambda x: x[1])
+        summaries.append((best_score, elapsed_time, generation, parameters))
+        print(f"Задача {index} ({len(summaries)}/{jobs_amount}): {parameters}, лучший счёт {best_score:.3f} "
+              f"на поколении {generation} за {elapsed_time:.2f} с, всего {time.time() - start:.2f} с")
+
+    # лучшие наборы - с наибольшим счетом, а при равном счете - быстрее дошедшие до него
+    print(f"Результаты записаны в {arguments.results}, лучшие наборы:")
+    for best_score, elapsed_time, generation, parameters in sorted(summaries, key = lambda x: (-x[0], x[1]))[:5]:
+        print(f"{parameters}: счёт {best_score:.3f}, поколение {generation}, {elapsed_time:.2f} с")
+
+
+if __name__ == "__main__":
+    sweep()
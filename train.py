@@ -0,0 +1,140 @@
+import random
+import time
+from typing import Literal
+
+import tap
+
+from apps.snake.component.brain import Brain
+from apps.snake.component.island import IslandModel, ReportType
+from apps.snake.component.map import Map, MapGeometry
+from apps.snake.component.snake import DeathCause
+from apps.snake.component.trainer import Trainer
+from apps.snake.service.library import BrainLibrary
+from apps.snake.service.performance import PerformanceLog
+from core.service.writer import BackgroundWriter
+
+
+class ArgumentParser(tap.Tap):
+    brain: str | None = None  # отпечаток мозга из библиотеки или путь к файлу мозга, по умолчанию - новый мозг
+    generations: int = 50  # количество поколений
+    generation_size: int = 10  # количество змей в поколении на один переносимый мозг
+    reference_brains: int = 10  # количество мозгов, переносимых в следующее поколение
+    save_best_brains: bool = False  # сохранять лучшие мозги за всю тренировку, а не только последнего поколения
+    sequential: bool = False  # обрабатывать змей по одной, а не всем поколением сразу
+    processes: int = 1  # количество процессов для оценки поколения, больше 1 - оценка в пуле процессов
+    islands: int = 1  # больше 1 - независимые популяции в отдельных процессах с обменом лучшими мозгами
+    migration_interval: int = 10  # через сколько поколений острова обмениваются мозгами
+    migrants: int = 2  # сколько лучших мозгов острова отправляется соседям
+    topology: Literal["ring", "all"] = "ring"  # ring - мигранты идут следующему острову, all - всем остальным
+    no_cycle_detection: bool = False  # не завершать зациклившихся змей досрочно
+    early_stopping: bool = False  # завершать змей, которые уже не могут попасть в число лучших
+    no_episodes: bool = False  # не записывать лучший эпизод каждого поколения для повтора в приложении
+    seed: int | None = None  # зерно генератора случайных чисел
+    checkpoint_interval: int = 10  # через сколько поколений сохранять контрольную точку, 0 - не сохранять
+    resume: bool = False  # продолжить прерванную тренировку с последней контрольной точки
+    performance_log: str | None = None  # файл счетчиков производительности (.jsonl или .csv), по умолчанию - в логах
+    food_seed: int | None = None  # одинаковая еда для всех змей, результаты уже оцененных мозгов берутся из кэша
+    tiles_in_radius: int = 10  # радиус мира в плитках
+    border_thickness: int = 1  # толщина границы мира в плитках
+
+
+def load_brain(library: BrainLibrary, brain: str | None) -> Brain:
+    if brain is None:
+        loaded_brain = Brain.get_default()
+    elif brain in library.entries:
+        loaded_brain = library.load(brain)
+    else:
+        loaded_brain = Brain.load_from_file(brain)
+    return loaded_brain
+
+
+# острова тренируются в своих процессах, а здесь только показывается их прогресс
+def train_islands(arguments: ArgumentParser, reference_map: Map, library: BrainLibrary) -> None:
+    model = IslandModel(
+        reference_map,
+        library,
+        arguments.islands,
+        arguments.migration_interval,
+        arguments.migrants,
+        arguments.topology
+    )
+    model.trainer_settings.update(
+        population_inference = not arguments.sequential,
+        save_best_brains = arguments.save_best_brains,
+        cycle_detection = not arguments.no_cycle_detection,
+        early_stopping = arguments.early_stopping
+    )
+    model.start(
+        [load_brain(library, arguments.brain)],
+        arguments.generations,
+        arguments.generation_size,
+        arguments.reference_brains
+    )
+
+    start = time.time()
+    while model.training:
+        for report_type, index, generation, data in model.collect():
+            if report_type == ReportType.GENERATION:
+                scores = tuple(round(x, 3) for x in data)
+                print(f"Остров {index}, поколение {generation}: счёт {scores}, {time.time() - start:.2f} с")
+            else:
+                print(f"Остров {index} закончил тренировку, мозгов: {len(data)}")
+
+    best_brain = model.best_brain
+    print(f"Сохранено мозгов: {sum(len(x) for x in model.results.values())}, "
+          f"лучший - {best_brain.digest} со счётом {best_brain.pretty_score}")
+
+
+# тренировка змей без окна: python train.py --generations 100 --generation_size 20
+def train() -> None:
+    arguments = ArgumentParser().parse_args()
+    if arguments.seed is not None:
+        random.seed(arguments.seed)
+
+    writer = BackgroundWriter("brain writer")
+    library = BrainLibrary(writer = writer)
+    reference_map = Map(
+        MapGeometry.get(arguments.tiles_in_radius, arguments.border_thickness),
+        food_seed = arguments.food_seed
+    )
+    if arguments.islands > 1:
+        train_islands(arguments, reference_map, library)
+        return
+
+    trainer = Trainer(reference_map, library, writer)
+    trainer.population_inference = not arguments.sequential
+    trainer.save_best_brains = arguments.save_best_brains
+    trainer.processes = arguments.processes
+    trainer.cycle_detection = not arguments.no_cycle_detection
+    trainer.early_stopping = arguments.early_stopping
+    trainer.record_episodes = not arguments.no_episodes
+    trainer.checkpoint_interval = arguments.checkpoint_interval
+    if arguments.performance_log is not None:
+        trainer.performance_log = PerformanceLog(arguments.performance_log)
+    if arguments.resume:
+        trainer.resume()
+    else:
+        trainer.start(
+            [load_brain(library, arguments.brain)],
+            arguments.generations,
+            arguments.generation_size,
+            arguments.reference_brains
+        )
+
+    while trainer.training:
+        start = time.time()
+        trainer.train_generation()
+        scores = tuple(x.pretty_score for x in trainer.reference_brains)
+        cycles = trainer.death_causes[DeathCause.CYCLE]
+        print(f"Поколение {trainer.reference_brains[0].generation}: счёт {scores}, зациклилось {cycles}, "
+              f"пропущено ходов {trainer.saved_ticks}, из кэша {trainer.cached_brains_amount}, "
+              f"{time.time() - start:.2f} с")
+
+    print(f"Сохранено мозгов: {len(trainer.reference_brains)}, лучший - {trainer.reference_brains[0].digest}")
+    print(f"Пропущено ходов за тренировку: {trainer.total_saved_ticks}")
+    cache = trainer.fitness_cache
+    print(f"Взято из кэша: {cache.hits}/{cache.lookups} ({cache.hit_rate:.0%})")
+
+
+if __name__ == "__main__":
+    train()